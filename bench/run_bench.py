@@ -0,0 +1,250 @@
+"""
+ApexLegendsPlugin 离线基准测试
+启动本地模拟服务器，以不同并发数调用 ApexLegendsPlugin.run，统计每个指令的吞吐量和 p50/p95/p99 延迟，
+并把结果写入 JSON 文件，方便不同版本之间对比
+
+需要在能导入插件依赖（AstrBot 运行环境）的 Python 中运行，例如在 AstrBot 根目录下：
+    python addons/plugins/apexlegends-plugin/bench/run_bench.py --concurrency 1,8,32 --requests 500
+对比两次结果：
+    python bench/run_bench.py --compare bench_old.json --output bench_new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, PLUGIN_DIR)
+
+from stub_server import StubConfig, start_stub_server  # noqa: E402
+
+# 消息组合：(权重, 消息模板)，{name} 会被替换为玩家名
+MIXES = {
+    # 接近真实群聊的组合：以地图和玩家查询为主
+    "default": [
+        (25, "apex map"),
+        (20, "apex player {name} PC"),
+        (10, "apex matches {name} PC"),
+        (8, "apex status"),
+        (5, "apex crafting"),
+        (5, "apex store"),
+        (5, "apex news"),
+        (5, "apex predator"),
+        (4, "apex leaderboard"),
+        (5, "apex uid {name} PC"),
+        (4, "apex rank 15000 PC"),
+        (4, "apex players {name},{name2},{name3} PC"),
+    ],
+    # 只有全局指令
+    "global": [
+        (40, "apex map"),
+        (15, "apex status"),
+        (15, "apex crafting"),
+        (10, "apex store"),
+        (10, "apex news"),
+        (10, "apex predator"),
+    ],
+    # 只有玩家指令
+    "players": [
+        (50, "apex player {name} PC"),
+        (25, "apex matches {name} PC"),
+        (15, "apex uid {name} PC"),
+        (10, "apex players {name},{name2},{name3} PC"),
+    ],
+}
+
+
+class BenchEvent:
+    """
+    最小化的消息事件，只提供插件用到的 message_str
+    """
+    def __init__(self, message_str: str) -> None:
+        self.message_str = message_str
+
+
+"""
+按消息组合生成 count 条消息。玩家名按近似 Zipf 分布抽取，少数热门玩家会被反复查询
+"""
+def build_messages(mix: str, count: int, player_pool: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    weights, templates = zip(*MIXES[mix])
+    names = [f"bench_player_{i}" for i in range(player_pool)]
+    name_weights = [1 / (i + 1) for i in range(player_pool)]
+    messages = []
+    for template in rnd.choices(templates, weights=weights, k=count):
+        picked = rnd.choices(names, weights=name_weights, k=3)
+        messages.append(template.format(name=picked[0], name2=picked[1], name3=picked[2]))
+    return messages
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+"""
+以指定并发数运行一轮测试，返回该轮的统计结果
+"""
+def run_level(plugin_cls, messages: list, concurrency: int) -> dict:
+    plugin = plugin_cls()
+    samples = []
+
+    def call(message):
+        start = time.perf_counter()
+        try:
+            _, reply = plugin.run(BenchEvent(message))
+            ok = bool(reply and reply[0])
+        except Exception:
+            ok = False
+        return message.split()[1], time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(call, messages))
+    elapsed = time.perf_counter() - started
+    plugin.terminate()
+
+    commands = {}
+    for command, latency, ok in samples:
+        stats = commands.setdefault(command, {"latencies": [], "ok": 0, "failed": 0})
+        stats["latencies"].append(latency * 1000)
+        stats["ok" if ok else "failed"] += 1
+
+    result = {"concurrency": concurrency, "requests": len(samples), "elapsed_s": round(elapsed, 4),
+              "throughput_rps": round(len(samples) / elapsed, 2), "commands": {}}
+    all_latencies = []
+    for command, stats in sorted(commands.items()):
+        latencies = sorted(stats.pop("latencies"))
+        all_latencies.extend(latencies)
+        result["commands"][command] = dict(
+            stats,
+            count=len(latencies),
+            throughput_rps=round(len(latencies) / elapsed, 2),
+            p50_ms=round(percentile(latencies, 50), 3),
+            p95_ms=round(percentile(latencies, 95), 3),
+            p99_ms=round(percentile(latencies, 99), 3),
+            mean_ms=round(sum(latencies) / len(latencies), 3),
+        )
+    all_latencies.sort()
+    result["overall"] = {
+        "p50_ms": round(percentile(all_latencies, 50), 3),
+        "p95_ms": round(percentile(all_latencies, 95), 3),
+        "p99_ms": round(percentile(all_latencies, 99), 3),
+    }
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PLUGIN_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(results: dict) -> None:
+    for level in results["levels"]:
+        print(f"\n并发 {level['concurrency']}：{level['requests']} 条消息，耗时 {level['elapsed_s']} 秒，"
+              f"吞吐 {level['throughput_rps']} 条/秒，上游请求 {sum(level['upstream_requests'].values())} 次")
+        print(f"{'指令':<12}{'次数':>8}{'失败':>8}{'条/秒':>10}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+        for command, stats in level["commands"].items():
+            print(f"{command:<12}{stats['count']:>8}{stats['failed']:>8}{stats['throughput_rps']:>10}"
+                  f"{stats['p50_ms']:>12}{stats['p95_ms']:>12}{stats['p99_ms']:>12}")
+
+
+"""
+与之前的结果文件对比，打印各并发数下每个指令 p50/p95 的变化
+"""
+def print_comparison(old: dict, new: dict) -> None:
+    old_levels = {level["concurrency"]: level for level in old["levels"]}
+    print(f"\n对比 {old['meta'].get('revision')} → {new['meta'].get('revision')}")
+    for level in new["levels"]:
+        base = old_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        print(f"\n并发 {level['concurrency']}：吞吐 {base['throughput_rps']} → {level['throughput_rps']} 条/秒")
+        for command, stats in level["commands"].items():
+            before = base["commands"].get(command)
+            if before is None:
+                continue
+            changes = []
+            for key in ("p50_ms", "p95_ms"):
+                delta = (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                changes.append(f"{key} {before[key]} → {stats[key]} ({delta:+.1f}%)")
+            print(f"  {command:<12}" + "，".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ApexLegendsPlugin 离线基准测试")
+    parser.add_argument("--concurrency", default="1,8,32", help="逗号分隔的并发数列表")
+    parser.add_argument("--requests", type=int, default=300, help="每个并发数下发送的消息数")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default", help="消息组合")
+    parser.add_argument("--players", type=int, default=50, help="玩家名池大小")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=50, help="模拟上游延迟")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟上游返回 500 的比例")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="模拟上游返回 429 的比例")
+    parser.add_argument("--bridge-legends", type=int, default=30, help="/bridge 响应中的传奇数量")
+    parser.add_argument("--rate-limit", type=float, default=0, help="插件的 APEX_RATE_LIMIT，0 表示不限流")
+    parser.add_argument("--prefetch", action="store_true", help="开启插件的后台预取")
+    parser.add_argument("--output", default="bench_results.json", help="结果文件路径")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_429,
+                        bridge_legends=args.bridge_legends, seed=args.seed)
+    server, api = start_stub_server(config)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ.update({
+        "APEX_LEGENDS_API_KEY": "bench",
+        "APEX_API_BASE_URL": base_url,
+        "APEX_RATE_LIMIT": str(args.rate_limit),
+        "APEX_PREFETCH": "1" if args.prefetch else "0",
+    })
+    from main import ApexLegendsPlugin
+
+    levels = []
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        api.hits = {}
+        # 每一轮使用全新的插件实例和数据目录，避免上一轮的缓存影响结果
+        with tempfile.TemporaryDirectory() as data_dir:
+            os.environ["APEX_DATA_DIR"] = data_dir
+            messages = build_messages(args.mix, args.requests, args.players, args.seed)
+            level = run_level(ApexLegendsPlugin, messages, concurrency)
+        level["upstream_requests"] = dict(api.hits)
+        levels.append(level)
+    server.shutdown()
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "levels": levels,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print_report(results)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+api.mozambiquehe.re 的本地模拟服务器，用于离线基准测试
+返回 fixtures/ 目录下录制的数据，可以配置响应延迟、错误率和 429 比例
+
+单独运行：python bench/stub_server.py --port 8765 --latency-ms 80 --error-rate 0.01 --rate-429 0.02
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ENDPOINTS = ("bridge", "nametouid", "leaderboard", "maprotation", "store", "crafting", "news", "servers", "predator")
+
+
+class StubConfig:
+    """
+    模拟服务器的行为配置
+    latency_ms / jitter_ms：每个请求的延迟（毫秒）及其随机浮动
+    error_rate：返回 500 的比例；rate_429：返回 429（带 Retry-After）的比例
+    bridge_legends：/bridge 响应中填充的传奇数量，用于模拟真实的响应体积
+    """
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, error_rate: float = 0.0,
+                 rate_429: float = 0.0, retry_after: int = 1, bridge_legends: int = 30, seed: int = None) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.bridge_legends = bridge_legends
+        self.random = random.Random(seed)
+
+
+class StubApi:
+    """
+    根据请求生成响应数据，并统计各接口的请求次数
+    """
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.fixtures = {}
+        for endpoint in ENDPOINTS:
+            with open(os.path.join(FIXTURES_DIR, f"{endpoint}.json"), encoding="utf-8") as f:
+                self.fixtures[endpoint] = json.load(f)
+        self.hits = {}
+        self._names = {}
+        self._lock = threading.Lock()
+        self._legends = self._build_legends(config.bridge_legends)
+
+    """
+    处理一个请求，返回 (状态码, 响应头, 响应体)
+    """
+    def handle(self, endpoint: str, query: dict):
+        with self._lock:
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+            roll = self.config.random.random()
+            delay = max(0.0, self.config.latency_ms + self.config.random.uniform(-1, 1) * self.config.jitter_ms)
+        time.sleep(delay / 1000)
+
+        if endpoint not in self.fixtures:
+            return 404, {}, {"Error": "Unknown endpoint"}
+        if not query.get("auth"):
+            return 403, {}, {"Error": "Missing auth"}
+        if roll < self.config.rate_429:
+            return 429, {"Retry-After": str(self.config.retry_after)}, {"Error": "Rate limit reached"}
+        if roll < self.config.rate_429 + self.config.error_rate:
+            return 500, {}, {"Error": "Internal error"}
+
+        now = int(time.time())
+        if endpoint == "bridge":
+            return self._bridge(query)
+        if endpoint == "nametouid":
+            name = query.get("player", "")
+            if name.startswith("missing"):
+                return 404, {}, {"Error": "Player not found"}
+            return 200, {}, dict(self.fixtures["nametouid"], name=name, uid=self._uid_for(name))
+        if endpoint == "maprotation":
+            return 200, {}, self._maprotation(now)
+        if endpoint == "crafting":
+            end = now - now % 86400 + 86400
+            items = [dict(item, start=end - 86400, end=end) for item in self.fixtures["crafting"]]
+            return 200, {}, items
+        if endpoint == "store":
+            end = now - now % 604800 + 604800
+            store = dict(self.fixtures["store"])
+            store["bundleContent"] = [dict(item, expireTimestamp=end) for item in store["bundleContent"]]
+            return 200, {}, store
+        return 200, {}, self.fixtures[endpoint]
+
+    def _bridge(self, query: dict):
+        if "uid" in query:
+            uids = query["uid"].split(",")
+            players = [self._player(self._names.get(uid, f"player_{uid[-6:]}"), uid) for uid in uids]
+            return 200, {}, players[0] if len(players) == 1 else players
+        name = query.get("player", "")
+        if name.startswith("missing"):
+            return 404, {}, {"Error": "Player not found"}
+        return 200, {}, self._player(name, self._uid_for(name))
+
+    """
+    玩家名对应的固定 UID，并记住对应关系，之后按 UID 查询时返回同一个名字
+    """
+    def _uid_for(self, name: str) -> str:
+        uid = str(1000000000000 + zlib.crc32(name.lower().encode("utf-8")))
+        self._names[uid] = name
+        return uid
+
+    def _player(self, name: str, uid: str) -> dict:
+        player = json.loads(json.dumps(self.fixtures["bridge"]))
+        player["global"]["name"] = name
+        player["global"]["uid"] = uid
+        player["legends"]["all"] = self._legends
+        return player
+
+    def _maprotation(self, now: int) -> dict:
+        data = json.loads(json.dumps(self.fixtures["maprotation"]))
+        for mode in data.values():
+            duration = mode["current"]["DurationInSecs"]
+            start = now - now % duration
+            end = start + duration
+            mode["current"].update(start=start, end=end, remainingSecs=end - now,
+                                   remainingMins=(end - now) // 60,
+                                   remainingTimer=time.strftime("%H:%M:%S", time.gmtime(end - now)))
+            mode["next"].update(start=end, end=end + duration)
+        return data
+
+    def _build_legends(self, count: int) -> dict:
+        legends = {}
+        for i in range(count):
+            legends[f"Legend{i}"] = {
+                "data": [
+                    {"name": f"Tracker {j}", "value": j * 137, "key": f"tracker_{j}", "rank": {"rankPos": "NOT_CALCULATED_YET", "topPercent": "NOT_CALCULATED_YET"}}
+                    for j in range(3)
+                ],
+                "gameInfo": {"skin": "Original", "skinRarity": "Common", "frame": "", "pose": "", "intro": "", "badges": [{"name": f"Badge {j}", "value": j} for j in range(3)]},
+                "ImgAssets": {"icon": f"https://api.mozambiquehe.re/assets/icons/legend{i}.png", "banner": f"https://api.mozambiquehe.re/assets/banners/legend{i}.jpg"},
+            }
+        return legends
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 插件关闭连接池时断开 keep-alive 连接属于正常情况，不打印异常
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+"""
+启动模拟服务器（后台线程），返回 (server, api)。port 为 0 时自动选择端口
+"""
+def start_stub_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+    api = StubApi(config)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            status, headers, payload = api.handle(url.path.strip("/"), query)
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = _QuietServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="apex-stub", daemon=True).start()
+    return server, api
+
+
+def main():
+    parser = argparse.ArgumentParser(description="api.mozambiquehe.re 本地模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--bridge-legends", type=int, default=30)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_429,
+                        bridge_legends=args.bridge_legends)
+    server, _ = start_stub_server(config, args.host, args.port)
+    print(f"模拟服务器已启动：http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,58 @@
 # Apex Legends API Key
 # 获取地址：https://apexlegendsapi.com/
 APEX_LEGENDS_API_KEY = "your_api_key_here"
+# 有多个 API key 时可以全部填在这里（环境变量中用逗号分隔），请求会分配给剩余配额最多的 key，
+# 某个 key 被限流或失效时由其他 key 接替
+# APEX_LEGENDS_API_KEYS = ["key_1", "key_2"]
 
+
+# HTTP 连接池大小（同时保持的 keep-alive 连接数）
+APEX_HTTP_POOL_SIZE = 10
+# 连接超时和读取超时（秒）
+APEX_CONNECT_TIMEOUT = 3.05
+APEX_READ_TIMEOUT = 10.0
+
+# 客户端限流：每个 API key 每秒最多请求数和允许的突发数（按 API key 的配额设置，<= 0 表示不限流）
+APEX_RATE_LIMIT = 2.0
+APEX_RATE_BURST = 2
+# 请求排队等待配额的最长时间（秒），超时后提示用户稍后再试
+APEX_QUEUE_TIMEOUT = 5.0
+
+# 熔断：同一接口连续失败（网络错误、5xx 或耗时超过 APEX_SLOW_THRESHOLD 秒）APEX_BREAKER_FAILURES 次后，
+# 暂停请求该接口 APEX_BREAKER_COOLDOWN 秒，期间返回最近一次获取的数据（<= 0 表示不熔断）
+APEX_BREAKER_FAILURES = 5
+APEX_BREAKER_COOLDOWN = 30.0
+APEX_SLOW_THRESHOLD = 5.0
+# 玩家查询耗时超过历史 p95 时再发一个对冲请求，取先返回的结果（会多消耗少量请求配额）
+APEX_HEDGE = False
+
+# 防刷屏：同一群 / 同一用户在窗口（秒）内重复的指令直接返回上一次的回复（<= 0 表示不去重）
+APEX_GROUP_DEDUP_SECS = 10.0
+APEX_USER_DEDUP_SECS = 30.0
+# 每个用户每分钟最多查询次数和允许的突发数，管理员不受限制（<= 0 表示不限制）
+APEX_USER_QUERIES_PER_MIN = 10.0
+APEX_USER_BURST = 5
+
+# 关注列表（apex watch）轮询每分钟最多使用的 /bridge 请求数，每次请求最多查询 10 名玩家（<= 0 表示关闭关注功能）
+APEX_WATCH_REQUESTS_PER_MIN = 6.0
+
+# 异步调用（run_async）时同时进行的最大查询数
+APEX_MAX_CONCURRENCY = 8
+
+# 是否在后台预取地图轮换、制造轮换、商店、猎杀者排行榜和服务器状态
+APEX_PREFETCH = True
+
+# 是否把缓存定期保存到数据目录的 cache.snapshot，插件重启后直接恢复
+APEX_CACHE_SNAPSHOT = True
+
+# 本地数据目录（玩家名 → UID 索引等），默认为插件目录下的 data/
+# APEX_DATA_DIR = "/path/to/data"
+
+# 查询不存在的玩家后，在多少秒内重复查询同一个名字直接回复未找到、不再请求 API（0 表示不记录）
+APEX_NAME_MISS_TTL = 300
+
+# 多个机器人进程共享的缓存文件（SQLite），所有实例设置为同一路径即可共享 API 数据，留空则不共享
+APEX_SHARED_CACHE = ""
+
+# 统计指标导出文件（Prometheus 文本格式，可配合 node_exporter 的 textfile collector 使用），留空则不导出
+APEX_METRICS_FILE = ""
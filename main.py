@@ -6,11 +6,33 @@ from nakuru import (
 from botpy.message import Message, DirectMessage
 from model.platform.qq import QQ
 import time
+import asyncio
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 import json
 import os
+import hashlib
+import mmap
+import heapq
+import itertools
+import random
+import sqlite3
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from cores.qqbot.global_object import AstrMessageEvent
 
+# 可选依赖：安装 ijson 后 /bridge 的响应会以流式方式解析，只构建需要的字段
+# 第一次解析 /bridge 时才导入（见 _load_ijson），不拖慢插件加载
+ijson = None
+_ijson_checked = False
+
 """
 Apex Legends 查询插件
 支持查询玩家统计、匹配历史、排行榜、地图轮换、商店、新闻等信息
@@ -19,28 +41,2087 @@ Apex Legends 查询插件
 小提示：把此模板仓库 fork 之后 clone 到机器人文件夹下的 addons/plugins/ 目录下，然后用 Pycharm/VSC 等工具打开可获更棒的编程体验（自动补全等）
 """
 
+# 支持查询的平台
+PLATFORMS = ("PC", "PS4", "X1")
+
+# 全局数据（与查询的用户无关）的默认缓存时间，单位秒
+# 地图轮换和制造轮换的实际过期时间以接口返回的数据为准
+GLOBAL_CACHE_TTL = {
+    "maprotation": 60,
+    "store": 600,
+    "crafting": 600,
+    "news": 900,
+    "servers": 60,
+    "predator": 300,
+    "leaderboard": 300,
+}
+# 缓存过期后仍可返回旧数据的时间窗口（同时在后台刷新），单位秒
+GLOBAL_CACHE_STALE = 300
+# 轮换边界之后额外等待的秒数，给上游留出切换数据的时间
+ROTATION_GRACE_SECS = 2
+
+# /bridge 响应中插件实际使用的字段，其余字段（传奇、徽章、追踪器等）在解析时直接丢弃
+BRIDGE_FIELDS = (
+    "global.name",
+    "global.uid",
+    "global.platform",
+    "global.level",
+    "global.rank",
+    "global.total",
+    "global.season",
+    "realtime",
+    "total",
+    "recentMatches",
+)
+
+# 统计指标：耗时直方图的分桶上界（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 统计指标中按指令区分的指令名，其余指令统一记为 other，避免标签数量无限增长
+COMMANDS = ("help", "player", "p", "players", "ps", "uid", "matches", "m", "trend", "rank", "leaderboard", "lb",
+            "map", "maps", "store", "crafting", "news", "status", "predator", "stats", "watch", "unwatch", "watchlist")
+# 结果取决于所在群（或私聊用户）的指令，不参与防刷屏的重复指令去重（仍受用户配额限制）
+TARGETED_COMMANDS = ("watch", "unwatch", "watchlist")
+# Prometheus 指标文件的写入间隔（秒）
+METRICS_EXPORT_INTERVAL = 30
+
+# 全局指令渲染结果缓存的最大条目数，超过后清空重建
+RENDER_CACHE_SIZE = 256
+# 回复内容随时间变化的渲染函数（例如地图剩余时间），渲染结果只在同一秒内复用
+CLOCK_RENDERERS = ("_render_map_rotation",)
+
+# 后台预取：这些接口在数据给出的轮换结束时间之后立即刷新
+PREFETCH_ROTATING = ("maprotation", "crafting", "store")
+# 这些接口没有明确的轮换时间，按 GLOBAL_CACHE_TTL 周期刷新
+PREFETCH_PERIODIC = ("predator", "servers")
+# 轮换刷新时间的随机延后范围（秒），以及周期刷新间隔的随机浮动比例
+PREFETCH_JITTER_SECS = 3
+PREFETCH_JITTER_RATIO = 0.1
+# 预取失败后的重试间隔（秒）
+PREFETCH_RETRY_SECS = 30
+
+# 批量查询玩家时一次最多查询的人数（/bridge 一次最多接受的 UID 数）
+MAX_BATCH_PLAYERS = 10
+
+# 玩家趋势：两次快照间隔超过该值（秒）视为不同的游戏时段
+TREND_SESSION_GAP = 2 * 3600
+# apex trend 最多读取的快照数和展示的时段数
+TREND_MAX_SNAPSHOTS = 2000
+TREND_MAX_SESSIONS = 5
+
+# 请求优先级，数值越小越先获得请求配额
+PRIORITY_INTERACTIVE = 0  # 用户发起的查询
+PRIORITY_BACKGROUND = 1  # 后台刷新
+# 上游返回 429 但没有 Retry-After 时的初始退避时间（秒），之后每次翻倍
+RATE_LIMIT_BACKOFF = 1.0
+# 配置了多个 API key 时，返回 403 的 key 停用的时间（秒）
+KEY_BENCH_SECS = 600
+
+# 对冲请求至少需要的历史耗时样本数，样本太少时 p95 不可靠，不发对冲请求
+HEDGE_MIN_SAMPLES = 20
+# 上游不可用时用于兜底的玩家数据条数（按写入顺序淘汰）
+PLAYER_FALLBACK_SIZE = 500
+# 缓存快照的保存间隔（秒），插件卸载时也会保存一次
+CACHE_SNAPSHOT_INTERVAL = 300
+
+# 跨进程共享缓存：玩家数据和玩家名 → UID 的缓存时间（秒），全局数据与进程内缓存的时间相同
+SHARED_PLAYER_TTL = 30
+SHARED_UID_TTL = 86400
+# 刷新共享缓存的进程持有租约的最长时间（秒），进程崩溃时租约到期后由其他进程接手
+SHARED_LEASE_SECS = 20
+# 等待其他进程刷新时检查结果的间隔（秒）
+SHARED_POLL_SECS = 0.05
+# 过期超过这个时间（秒）的共享缓存条目会被清理
+SHARED_RETENTION_SECS = 3600
+# 上游返回错误时，错误在共享缓存中保留的时间（秒），等待中的进程直接读取错误，不再各自请求上游
+SHARED_FAILURE_TTL = 5
+
+# 关注列表的轮询：每 WATCH_TICK_SECS 秒检查一次到期的玩家
+WATCH_TICK_SECS = 15
+# 玩家在线时的轮询间隔；离线时每次翻倍，最长 WATCH_MAX_SECS
+WATCH_FAST_SECS = 60
+WATCH_MAX_SECS = 1800
+# 每个群（或私聊用户）最多关注的玩家数，以及等待随下一条回复发出的通知条数
+WATCH_MAX_PER_TARGET = 20
+WATCH_PENDING_MAX = 20
+
+# 玩家名模糊索引最多保存的名字数（超出时淘汰最久没有出现的名字）
+NAME_INDEX_SIZE = 20000
+# 未找到玩家时给出的相近名字数，以及候选名字与输入的三元组相似度下限
+NAME_SUGGEST_LIMIT = 3
+NAME_SUGGEST_MIN_SIMILARITY = 0.3
+# 最近返回 404 的玩家名最多记录的条数
+NAME_MISS_SIZE = 2000
+
+
+"""
+读取插件配置：优先读取环境变量，其次读取 config.py，都没有时使用默认值
+环境变量的值会按默认值的类型进行转换
+"""
+def load_setting(name: str, default=None):
+    value = os.getenv(name, None)
+    if value is not None and default is not None and not isinstance(default, str):
+        try:
+            if isinstance(default, bool):
+                return value.strip().lower() in ("1", "true", "yes", "on")
+            return type(default)(value)
+        except ValueError:
+            print(f"警告：环境变量 {name} 的值无效，使用默认值 {default}")
+            return default
+    if value is not None:
+        return value
+    try:
+        import config
+        return getattr(config, name, default)
+    except ImportError:
+        return default
+
+
+class ApexApiError(Exception):
+    """
+    上游 API 返回错误。status_code 为 None 表示未配置 API key
+    params 为本次请求的参数（不含 auth），用于生成错误提示
+    """
+    def __init__(self, status_code, params: dict = None) -> None:
+        super().__init__(f"API 请求失败：{status_code}")
+        self.status_code = status_code
+        self.params = params or {}
+
+
+class LocalApiError(ApexApiError):
+    """
+    本进程产生的错误，请求没有发往上游（排队超时、所有 key 都已停用、熔断），
+    只反映本进程的限流器、key 和熔断器状态
+    """
+
+
+"""
+从完整的 /bridge 数据中只保留 BRIDGE_FIELDS 中的字段，支持单个玩家（dict）和多个玩家（list）
+"""
+def compact_bridge(data):
+    if isinstance(data, list):
+        return [compact_bridge(player) for player in data]
+    if not isinstance(data, dict):
+        return data
+    compact = {}
+    for path in BRIDGE_FIELDS:
+        node = data
+        keys = path.split(".")
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                break
+            node = node[key]
+        else:
+            _set_path(compact, keys, node)
+    return compact
+
+
+def _set_path(target: dict, keys: list, value) -> None:
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    target[keys[-1]] = value
+
+
+"""
+导入可选依赖 ijson，没有安装时返回 None。只在第一次调用时尝试导入
+"""
+def _load_ijson():
+    global ijson, _ijson_checked
+    if not _ijson_checked:
+        try:
+            import ijson as module
+            ijson = module
+        except ImportError:
+            pass
+        _ijson_checked = True
+    return ijson
+
+
+"""
+流式解析响应时可能出现的读取和解析错误。直接读取 response.raw 时 requests 不会把它们转换为 RequestException
+"""
+def _stream_errors() -> tuple:
+    errors = (urllib3.exceptions.HTTPError, ValueError)
+    return errors + (ijson.JSONError,) if _load_ijson() is not None else errors
+
+
+"""
+解析 /bridge 的响应。安装了 ijson 时边读取边解析，只为 BRIDGE_FIELDS 中的字段构建对象；
+否则完整解析后再裁剪。两种方式返回的数据相同
+"""
+def decode_bridge(response):
+    if _load_ijson() is None:
+        return compact_bridge(response.json())
+    response.raw.decode_content = True
+    wanted = {tuple(path.split(".")) for path in BRIDGE_FIELDS}
+    result = None
+    player = None
+    builder = None
+    building = None
+    depth = 0
+    for prefix, event, value in ijson.parse(response.raw, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    _set_path(player, building, builder.value)
+                    builder = None
+            continue
+        if prefix == "" and event == "start_array":
+            result = []
+            continue
+        if event == "start_map" and prefix in ("", "item"):
+            player = {}
+            if isinstance(result, list):
+                result.append(player)
+            else:
+                result = player
+            continue
+        path = prefix.split(".")
+        if isinstance(result, list):
+            path = path[1:]
+        path = tuple(path)
+        if path not in wanted or event in ("map_key", "end_map", "end_array"):
+            continue
+        if event in ("start_map", "start_array"):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            building = list(path)
+            depth = 1
+        else:
+            _set_path(player, list(path), value)
+    return result
+
+
+class Metrics:
+    """
+    轻量的进程内统计指标：计数器和固定分桶的直方图
+    每次记录只需要一次加锁和一次二分查找，可以在生产环境中常开
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    """
+    计数器增加 amount。labels 为标签字典
+    """
+    def inc(self, name: str, labels: dict = None, amount: float = 1) -> None:
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    """
+    在直方图中记录一次观测值（秒）
+    """
+    def observe(self, name: str, labels: dict, value: float) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        # 落入第一个上界 >= value 的分桶（与 Prometheus 的 le 语义一致），超过所有上界时落入 +Inf
+        index = bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    """
+    读取计数器的值
+    """
+    def counter(self, name: str, labels: dict = None) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted((labels or {}).items()))), 0)
+
+    """
+    返回 {标签: 值}，包含该计数器的所有标签组合
+    """
+    def counters(self, name: str) -> dict:
+        with self._lock:
+            return {labels: value for (key, labels), value in self._counters.items() if key == name}
+
+    """
+    返回 {标签: (次数, 总和, p50, p95)}，分位数按所在分桶的上界估算
+    """
+    def histograms(self, name: str) -> dict:
+        with self._lock:
+            items = [(labels, [list(h[0]), h[1], h[2]]) for (key, labels), h in self._histograms.items() if key == name]
+        return {labels: (count, total, self._quantile(buckets, count, 0.5), self._quantile(buckets, count, 0.95))
+                for labels, (buckets, total, count) in items}
+
+    """
+    估算某个直方图的分位数，没有数据时返回 None
+    """
+    def quantile(self, name: str, labels: dict, q: float):
+        with self._lock:
+            histogram = self._histograms.get((name, tuple(sorted(labels.items()))))
+            if histogram is None:
+                return None
+            buckets, count = list(histogram[0]), histogram[2]
+        return self._quantile(buckets, count, q)
+
+    def _quantile(self, buckets: list, count: int, q: float):
+        if count == 0:
+            return None
+        target = q * count
+        seen = 0
+        for i, bucket in enumerate(buckets):
+            seen += bucket
+            if seen >= target:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float("inf")
+        return float("inf")
+
+    """
+    以 Prometheus 文本格式导出所有指标
+    """
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, [list(h[0]), h[1], h[2]]) for key, h in self._histograms.items())
+
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            lines.append(f"{name}{fmt_labels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            cumulative = 0
+            for bound, bucket in zip(list(LATENCY_BUCKETS) + ["+Inf"], buckets):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{fmt_labels(labels)} {total}")
+            lines.append(f"{name}_count{fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class SingleFlight:
+    """
+    合并相同的并发请求：同一个 key 同时只有一个调用在执行，其余调用等待并共享它的结果（或异常）
+    """
+    class _Call:
+        __slots__ = ("event", "result", "error")
+
+        def __init__(self) -> None:
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self) -> None:
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    """
+    执行 fn 并返回结果。如果相同 key 的调用正在进行，则等待它完成并返回同一个结果
+    """
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class RateLimiter:
+    """
+    令牌桶限流器，按优先级排队
+    每秒补充 rate 个令牌，最多积攒 burst 个；等待中的请求按 (优先级, 到达顺序) 依次获得令牌
+    rate <= 0 表示不限流，但 pause 设置的暂停（上游返回 429）仍然有效
+    """
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    """
+    获取一个令牌，最多等待 timeout 秒。成功返回 True，超时返回 False
+    """
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.rate <= 0:
+            return self._wait_pause(deadline)
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_head = self._waiters[0] == ticket
+                    if is_head and self._tokens >= 1 and now >= self._paused_until:
+                        self._tokens -= 1
+                        return True
+                    remaining = None if deadline is None else deadline - now
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    # 队首等待下一个令牌，其他请求等待队首取走令牌后的通知
+                    wait = remaining
+                    if is_head:
+                        wait = max((1 - self._tokens) / self.rate, self._paused_until - now, 0.001)
+                        if remaining is not None:
+                            wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if self._waiters[0] == ticket:
+                    heapq.heappop(self._waiters)
+                else:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    """
+    暂停发放令牌 seconds 秒（上游返回 429 时使用）
+    """
+    def pause(self, seconds: float) -> None:
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._cond.notify_all()
+
+    """
+    估算 priority 优先级的请求现在排队需要等待的时间（秒），考虑暂停和排在前面的请求
+    """
+    def delay(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        with self._cond:
+            now = time.monotonic()
+            if self.rate <= 0:
+                return max(self._paused_until - now, 0.0)
+            self._refill(now)
+            ahead = sum(1 for waiter in self._waiters if waiter[0] <= priority)
+            return max(self._paused_until - now, (ahead + 1 - self._tokens) / self.rate, 0.0)
+
+    """
+    不限流时只等待暂停结束，最多等到 deadline。暂停已结束返回 True，超时返回 False
+    """
+    def _wait_pause(self, deadline) -> bool:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    return True
+                if deadline is not None and now >= deadline:
+                    return False
+                wait = self._paused_until - now
+                self._cond.wait(wait if deadline is None else min(wait, deadline - now))
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class ApiKey:
+    """
+    API key 池中的一个 key：独立的限流器、请求计数和停用截止时间
+    """
+    def __init__(self, index: int, key: str, rate: float, burst: int) -> None:
+        self.index = index
+        self.key = key
+        self.limiter = RateLimiter(rate, burst)
+        self.requests = 0
+        self.benched_until = 0.0
+
+
+class KeyPool:
+    """
+    API key 池。每个 key 按自己的配额限流，请求分配给排队时间最短（剩余配额最多）的 key
+    返回 429 的 key 暂停到 Retry-After 之后，返回 403 的 key 停用一段时间，期间由其他 key 承担请求
+    """
+    def __init__(self, keys: list, rate: float, burst: int) -> None:
+        self.keys = [ApiKey(i + 1, key, rate, burst) for i, key in enumerate(keys)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    """
+    为一次请求分配 key，最多等待 timeout 秒。没有 key 能在截止时间前拿到配额时立即返回 None
+    """
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: float = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            candidates = [key for key in self.keys if key.benched_until <= now]
+            if not candidates:
+                return None
+            delays = [(key.limiter.delay(priority), key.requests, key.index, key) for key in candidates]
+            wait, _, _, key = min(delays, key=lambda item: item[:3])
+            remaining = None if deadline is None else deadline - now
+            if remaining is not None and wait > remaining:
+                return None
+            if key.limiter.acquire(priority, remaining):
+                with self._lock:
+                    key.requests += 1
+                return key
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+    """
+    是否还有未被停用的 key
+    """
+    def healthy(self) -> bool:
+        now = time.monotonic()
+        return any(key.benched_until <= now for key in self.keys)
+
+    """
+    停用 key seconds 秒，返回该 key 之前是否可用（并发请求同时失败时只有第一次返回 True）
+    """
+    def bench(self, key: ApiKey, seconds: float) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            was_healthy = key.benched_until <= now
+            key.benched_until = max(key.benched_until, now + seconds)
+            return was_healthy
+
+    """
+    返回 [(序号, 状态, 请求次数)]，状态为 正常 / 限流中 / 已停用
+    """
+    def states(self) -> list:
+        now = time.monotonic()
+        states = []
+        for key in self.keys:
+            if key.benched_until > now:
+                state = "已停用"
+            elif key.limiter.delay() > 1:
+                state = "限流中"
+            else:
+                state = "正常"
+            states.append((key.index, state, key.requests))
+        return states
+
+
+class CircuitOpenError(LocalApiError):
+    """
+    熔断器处于打开状态，请求没有发往上游
+    """
+    def __init__(self, endpoint: str, params: dict = None) -> None:
+        super().__init__(503, params)
+        self.endpoint = endpoint
+
+
+class CircuitBreaker:
+    """
+    单个接口的熔断器
+    连续失败（网络错误、5xx 或响应过慢）达到 failure_threshold 次后打开，期间直接拒绝请求；
+    cooldown 秒后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    """
+    当前状态：closed / open / half_open
+    """
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return "open"
+            return "half_open"
+
+    """
+    判断是否放行本次请求。半开状态下同时只放行一个探测请求
+    """
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    """
+    放行的请求最终没有发出（例如排队超时），半开状态下允许下一个请求探测
+    """
+    def cancel(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    """
+    记录一次失败，返回熔断器是否因此（重新）打开
+    """
+    def record_failure(self) -> bool:
+        with self._lock:
+            self._failures += 1
+            probing, self._probing = self._probing, False
+            if probing or (self._opened_at is None and 0 < self.failure_threshold <= self._failures):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ApexApiClient:
+    """
+    api.mozambiquehe.re 的 HTTP 客户端
+    所有请求共享一个带连接池的 Session，复用 TCP/TLS 连接（keep-alive），并统一处理鉴权和状态码
+    相同接口、相同参数的并发请求只会向上游发出一次
+    请求从 key 池中分配 API key 并取得该 key 的配额，排队最多 queue_timeout 秒；上游返回 429 时该 key 按 Retry-After 暂停，
+    请求换一个 key 重试；多个 key 时返回 403 的 key 会被停用
+    每个接口有独立的熔断器：连续失败或响应过慢时快速失败（抛出 CircuitOpenError），冷却后用半开请求探测恢复
+    hedge 为 True 的请求在耗时超过该接口历史 p95 时再发一个对冲请求，取先返回的结果
+    decoders 中的接口使用专门的解析函数（例如只提取需要字段的 /bridge 解析）
+    每次请求的排队时间、上游耗时、状态码、流量和解析耗时都记录到 metrics 中
+    """
+    decoders = {"bridge": decode_bridge}
+
+    def __init__(self, base_url: str, api_keys: list, pool_size: int = 10,
+                 connect_timeout: float = 3.05, read_timeout: float = 10,
+                 rate_limit: float = 2, rate_burst: int = 2, queue_timeout: float = 5,
+                 breaker_failures: int = 5, breaker_cooldown: float = 30, slow_threshold: float = 5,
+                 hedge: bool = False, metrics: Metrics = None) -> None:
+        self.base_url = base_url
+        self.metrics = metrics or Metrics()
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self.keys = KeyPool(api_keys, rate_limit, rate_burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        self._inflight = SingleFlight()
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.slow_threshold = slow_threshold
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+        # 对冲请求在单独的线程池中发出，主请求和对冲请求各占一个线程
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="apexlegends-hedge") if hedge else None
+
+    """
+    请求接口并返回解析后的 JSON。非 200 状态码会抛出 ApexApiError，网络错误抛出 requests 的异常
+    """
+    def get(self, endpoint: str, params: dict = None, priority: int = PRIORITY_INTERACTIVE, hedge: bool = False):
+        params = params or {}
+        if not self.keys:
+            raise ApexApiError(None, params)
+        key = (endpoint, tuple(sorted(params.items())))
+        return self._inflight.do(key, lambda: self._request(endpoint, params, priority, hedge))
+
+    """
+    获取接口对应的熔断器
+    """
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(self.breaker_failures, self.breaker_cooldown)
+            return breaker
+
+    """
+    返回 {接口: 熔断器状态}
+    """
+    def breaker_states(self) -> dict:
+        with self._breakers_lock:
+            breakers = list(self._breakers.items())
+        return {endpoint: breaker.state for endpoint, breaker in breakers}
+
+    """
+    实际向上游发出请求。排队超时或 429 重试到截止时间仍未成功时抛出状态码为 429 的 ApexApiError
+    """
+    def _request(self, endpoint: str, params: dict, priority: int, hedge: bool = False):
+        url = f"{self.base_url}/{endpoint}"
+        deadline = time.monotonic() + self.queue_timeout
+        attempt = 0
+        labels = {"endpoint": endpoint}
+        breaker = self.breaker(endpoint)
+        while True:
+            if not breaker.allow():
+                self.metrics.inc("apex_breaker_rejections_total", labels)
+                raise CircuitOpenError(endpoint, params)
+            queued = time.perf_counter()
+            key = self.keys.acquire(priority, deadline - time.monotonic())
+            self.metrics.observe("apex_queue_wait_seconds", labels, time.perf_counter() - queued)
+            if key is None:
+                breaker.cancel()
+                if not self.keys.healthy():
+                    raise LocalApiError(403, params)
+                self.metrics.inc("apex_queue_timeouts_total", labels)
+                raise LocalApiError(429, params)
+            decoder = self.decoders.get(endpoint)
+            started = time.perf_counter()
+            try:
+                if hedge and self._hedge_pool is not None:
+                    response, key = self._send_hedged(endpoint, url, params, decoder is not None, key)
+                else:
+                    response = self._send(endpoint, url, {"auth": key.key, **params}, decoder is not None)
+            except requests.exceptions.RequestException:
+                self._record_failure(endpoint, breaker)
+                raise
+            # 流式解析的响应体还没有读取，读取并解析成功后才算成功
+            streamed = decoder is not None and response.status_code == 200
+            failed = response.status_code >= 500 or time.perf_counter() - started > self.slow_threshold
+            if failed:
+                self._record_failure(endpoint, breaker)
+            elif not streamed:
+                breaker.record_success()
+            if response.status_code == 429:
+                response.close()
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = RATE_LIMIT_BACKOFF * (2 ** attempt)
+                # 加入随机抖动，避免等待中的请求在同一时刻一起重试
+                delay *= random.uniform(1.0, 1.5)
+                # 只暂停这个 key，其他 key 有配额时立即换 key 重试；所有 key 都来不及时由 acquire 返回 None
+                key.limiter.pause(delay)
+                self.metrics.inc("apex_key_throttled_total", {"key": str(key.index)})
+                attempt += 1
+                continue
+            if response.status_code == 403 and len(self.keys) > 1:
+                response.close()
+                if self.keys.bench(key, KEY_BENCH_SECS):
+                    self.metrics.inc("apex_key_benched_total", {"key": str(key.index)})
+                    print(f"Apex Legends 插件：第 {key.index} 个 API key 被拒绝（403），停用 {KEY_BENCH_SECS} 秒")
+                continue
+            if response.status_code != 200:
+                response.close()
+                raise ApexApiError(response.status_code, params)
+            # 流式解析时响应体在解析过程中读取，解析耗时包含读取时间
+            started = time.perf_counter()
+            if decoder is not None:
+                try:
+                    with response:
+                        data = decoder(response)
+                        size = response.raw.tell()
+                except _stream_errors() as e:
+                    # 响应体被截断或读取超时，按网络错误处理（熔断计数、旧数据兜底）
+                    if not failed:
+                        self._record_failure(endpoint, breaker)
+                    raise requests.exceptions.ChunkedEncodingError(f"读取 {endpoint} 响应失败：{str(e)}") from e
+                if not failed:
+                    breaker.record_success()
+            else:
+                data = response.json()
+                size = len(response.content)
+            self.metrics.observe("apex_decode_seconds", labels, time.perf_counter() - started)
+            self.metrics.inc("apex_upstream_bytes_total", labels, size)
+            return data
+
+    """
+    发出一次 HTTP 请求，并记录上游耗时和状态码
+    """
+    def _send(self, endpoint: str, url: str, query: dict, stream: bool):
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=query, timeout=self.timeout, stream=stream)
+        except requests.exceptions.RequestException:
+            self.metrics.inc("apex_upstream_responses_total", {"endpoint": endpoint, "status": "error"})
+            raise
+        self.metrics.observe("apex_upstream_seconds", {"endpoint": endpoint}, time.perf_counter() - started)
+        self.metrics.inc("apex_upstream_responses_total", {"endpoint": endpoint, "status": str(response.status_code)})
+        return response
+
+    """
+    发出请求，耗时超过该接口历史 p95 时再发一个对冲请求，返回 (先成功的响应, 该请求使用的 key)
+    对冲请求不排队等待配额，拿不到令牌时只等待主请求
+    """
+    def _send_hedged(self, endpoint: str, url: str, params: dict, stream: bool, key: ApiKey):
+        labels = {"endpoint": endpoint}
+        count = self.metrics.histograms("apex_upstream_seconds").get(tuple(labels.items()), (0,))[0]
+        delay = self.metrics.quantile("apex_upstream_seconds", labels, 0.95)
+        if count < HEDGE_MIN_SAMPLES or delay is None or delay == float("inf"):
+            return self._send(endpoint, url, {"auth": key.key, **params}, stream), key
+        primary = self._hedge_pool.submit(self._send, endpoint, url, {"auth": key.key, **params}, stream)
+        try:
+            return primary.result(timeout=delay), key
+        except FutureTimeoutError:
+            pass
+        hedge_key = self.keys.acquire(PRIORITY_INTERACTIVE, 0)
+        if hedge_key is None:
+            return primary.result(), key
+        self.metrics.inc("apex_hedged_requests_total", labels)
+        hedged = self._hedge_pool.submit(self._send, endpoint, url, {"auth": hedge_key.key, **params}, stream)
+        done, _ = wait([primary, hedged], return_when=FIRST_COMPLETED)
+        winner = primary if primary in done else hedged
+        loser = hedged if winner is primary else primary
+        if winner.exception() is not None or winner.result().status_code != 200:
+            # 先返回的请求失败时等待另一个
+            winner, loser = loser, winner
+            winner.result()
+        if winner is hedged:
+            self.metrics.inc("apex_hedge_wins_total", labels)
+        # 没有用到的响应在完成后关闭，归还连接
+        loser.add_done_callback(lambda future: future.exception() is None and future.result().close())
+        return winner.result(), hedge_key if winner is hedged else key
+
+    def _record_failure(self, endpoint: str, breaker: CircuitBreaker) -> None:
+        if breaker.record_failure():
+            self.metrics.inc("apex_breaker_opened_total", {"endpoint": endpoint})
+            print(f"Apex Legends 插件：{endpoint} 接口连续失败，暂停请求 {breaker.cooldown:g} 秒")
+
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期），无法解析时返回 None
+    """
+    def _retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    """
+    关闭连接池
+    """
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+class ResponseCache:
+    """
+    线程安全的响应缓存
+    每个条目记录过期时间，过期后在 stale 窗口内仍会返回旧数据，并标记为不新鲜
+    超过 stale 窗口的条目不再由 get 返回，但会保留到被覆盖，上游不可用时可以通过 last 取出兜底
+    max_entries 不为 None 时按写入顺序淘汰最早的条目
+    从快照恢复的条目值为 LazyValue，第一次读取时才解析
+    """
+    def __init__(self, max_entries: int = None) -> None:
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    """
+    读取缓存。返回 (数据, 是否新鲜)，没有可用数据时返回 None
+    """
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        _, expires_at, stale_until, _ = entry
+        if now >= stale_until:
+            return None
+        loaded, value = self._resolve(key, entry)
+        return (value, now < expires_at) if loaded else None
+
+    """
+    读取最近一次写入的数据，不论是否过期。返回 (数据, 写入时间)，没有数据时返回 None
+    """
+    def last(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        loaded, value = self._resolve(key, entry)
+        return (value, entry[3]) if loaded else None
+
+    """
+    返回条目的过期时间（unix 时间戳），没有条目时返回 None。不解析快照恢复的值
+    """
+    def expires(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    """
+    写入缓存，ttl 为新鲜时间，stale 为过期后仍可返回旧数据的时间
+    """
+    def set(self, key, value, ttl: float, stale: float = 0) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (value, now + ttl, now + ttl + stale, now)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    """
+    导出所有条目，返回 [(键, 值, 过期时间, stale 截止时间, 写入时间)]，值可能是尚未解析的 LazyValue
+    """
+    def dump(self) -> list:
+        with self._lock:
+            return [(key,) + entry for key, entry in self._entries.items()]
+
+    """
+    恢复 dump 导出的条目。已有的条目比快照新，不会被覆盖
+    """
+    def restore(self, entries: list) -> None:
+        with self._lock:
+            for key, value, expires_at, stale_until, stored_at in entries:
+                if key not in self._entries:
+                    self._entries[key] = (value, expires_at, stale_until, stored_at)
+                    self._entries.move_to_end(key, last=False)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.max_entries is not None and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    """
+    返回 (是否可用, 值)。快照恢复的值无法解析（文件损坏）时删除该条目，按未命中处理
+    """
+    def _resolve(self, key, entry):
+        value = entry[0]
+        if not isinstance(value, LazyValue):
+            return True, value
+        try:
+            return True, value.load()
+        except ValueError as e:
+            print(f"警告：缓存快照中的条目 {key} 无法读取（{str(e)}），已丢弃")
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return False, None
+
+
+class LazyValue:
+    """
+    缓存快照中的一个条目：zlib 压缩的 JSON，第一次读取时才解压解析
+    解析前只引用快照文件的映射区域，不占用额外内存
+    """
+    __slots__ = ("_snapshot", "_offset", "_length", "_raw", "_decode", "_value", "_loaded")
+
+    def __init__(self, snapshot, offset: int, length: int, decode=None) -> None:
+        self._snapshot = snapshot
+        self._offset = offset
+        self._length = length
+        self._raw = None
+        self._decode = decode
+        self._value = None
+        self._loaded = False
+
+    """
+    返回解析后的值。数据损坏时抛出 ValueError
+    """
+    def load(self):
+        if not self._loaded:
+            try:
+                value = json.loads(zlib.decompress(self.raw()))
+                value = self._decode(value) if self._decode else value
+            except (zlib.error, TypeError, ValueError) as e:
+                raise ValueError(f"数据损坏：{str(e)}") from e
+            self._value = value
+            self._loaded = True
+        return self._value
+
+    """
+    返回压缩后的数据。第一次调用时从映射区域复制出来，之后不再读取快照文件
+    """
+    def raw(self) -> bytes:
+        if self._raw is None:
+            self._raw = self._snapshot.read(self._offset, self._length)
+        return self._raw
+
+
+class CacheSnapshot:
+    """
+    响应缓存的磁盘快照，用于插件重启后立即命中缓存
+    文件格式：魔数、4 字节索引长度、JSON 索引（键、过期时间、数据位置），之后是各条目 zlib 压缩的 JSON
+    加载时通过 mmap 映射文件，只解析索引；条目数据在第一次读取时才解压解析
+    保存时先写临时文件再替换，未解析的条目直接复制压缩数据，不重新编码
+    """
+    MAGIC = b"APEXSNAP1\n"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._buffer = None
+
+    """
+    加载快照，返回 {缓存名: dump 格式的条目列表}。文件不存在或格式不对时返回空字典
+    decoders 为 {缓存名: 解析函数}，用于把 JSON 中的列表还原为原来的类型
+    """
+    def load(self, decoders: dict = None) -> dict:
+        decoders = decoders or {}
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return {}
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            f.close()
+            return {}
+        start = len(self.MAGIC) + 4
+        try:
+            if buffer[:len(self.MAGIC)] != self.MAGIC:
+                raise ValueError("未知的快照格式")
+            size = int.from_bytes(buffer[len(self.MAGIC):start], "big")
+            index = json.loads(buffer[start:start + size])
+            base = start + size
+            caches = {}
+            for name, rows in index.items():
+                decode = decoders.get(name)
+                entries = caches[name] = []
+                for key, expires_at, stale_until, stored_at, offset, length in rows:
+                    key = tuple(key) if isinstance(key, list) else key
+                    hash(key)
+                    entries.append((key, LazyValue(self, base + int(offset), int(length), decode),
+                                    float(expires_at), float(stale_until), float(stored_at)))
+        except (AttributeError, TypeError, ValueError) as e:
+            # 索引格式不对（例如条目字段数不对）时和文件头损坏一样，忽略整个快照
+            print(f"警告：缓存快照 {self.path} 无法读取（{str(e)}），已忽略")
+            buffer.close()
+            f.close()
+            return {}
+        with self._lock:
+            self._release()
+            self._file, self._buffer = f, buffer
+        return caches
+
+    """
+    读取映射区域中的一段数据
+    """
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            if self._buffer is None:
+                raise ValueError("缓存快照已关闭")
+            return self._buffer[offset:offset + length]
+
+    """
+    保存快照。caches 为 {缓存名: ResponseCache}
+    """
+    def save(self, caches: dict) -> None:
+        index = {}
+        blobs = []
+        offset = 0
+        for name, cache in caches.items():
+            rows = index[name] = []
+            for key, value, expires_at, stale_until, stored_at in cache.dump():
+                if isinstance(value, LazyValue):
+                    raw = value.raw()
+                else:
+                    raw = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+                rows.append([key, expires_at, stale_until, stored_at, offset, len(raw)])
+                blobs.append(raw)
+                offset += len(raw)
+        header = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(len(header).to_bytes(4, "big"))
+            f.write(header)
+            for raw in blobs:
+                f.write(raw)
+        # 条目的压缩数据都已复制出来，可以释放映射（Windows 上被映射的文件不能替换）
+        with self._lock:
+            self._release()
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._release()
+
+    def _release(self) -> None:
+        if self._buffer is not None:
+            self._buffer.close()
+            self._file.close()
+            self._buffer = self._file = None
+
+
+class SharedCache:
+    """
+    同一台机器上多个插件实例（多个机器人进程）共享的响应缓存，保存在 WAL 模式的 SQLite 中
+    每个键有跨进程的租约：缓存未命中时只有拿到租约的进程请求上游，其他进程等待并读取它写入的结果，
+    上游请求量不随实例数增加。持有租约的进程崩溃时，租约在 SHARED_LEASE_SECS 秒后失效
+    同一进程内相同键的并发调用先合并为一次；上游返回错误时错误也会写入，等待的进程读取后抛出同样的错误
+    """
+    def __init__(self, path: str, wait_timeout: float = 10) -> None:
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._owners = itertools.count()
+        self._writes = 0
+        # isolation_level=None：手动控制事务，获取租约时用 BEGIN IMMEDIATE 加写锁
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, until REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS failures ("
+            "key TEXT PRIMARY KEY, status INTEGER NOT NULL, params TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    """
+    读取未过期的缓存，返回 (数据, 是否来自共享缓存)。未命中时由一个进程调用 fetch 请求上游并写入缓存
+    ttl 为缓存时间（秒），也可以是根据数据计算缓存时间的函数
+    fetch 抛出上游返回的 ApexApiError（不含 LocalApiError）时，错误写入缓存 SHARED_FAILURE_TTL 秒，期间读取该键的调用抛出同样的错误
+    """
+    def get_or_fetch(self, key: str, fetch, ttl):
+        return self._flight.do(key, lambda: self._get_or_fetch(key, fetch, ttl))
+
+    def _get_or_fetch(self, key: str, fetch, ttl):
+        owner = f"{os.getpid()}-{next(self._owners)}"
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            value = self.read(key)
+            if value is not None:
+                return value, True
+            self._raise_failure(key)
+            if self._acquire_lease(key, owner):
+                try:
+                    # 拿到租约前其他进程可能刚好写入了结果
+                    value = self.read(key)
+                    if value is not None:
+                        return value, True
+                    self._raise_failure(key)
+                    return self._fetch(key, fetch, ttl), False
+                finally:
+                    self._release_lease(key, owner)
+            # 其他进程正在刷新，等待它的结果；等待超时则自己请求
+            if time.monotonic() >= deadline:
+                return fetch(), False
+            time.sleep(SHARED_POLL_SECS)
+
+    def _fetch(self, key: str, fetch, ttl):
+        try:
+            value = fetch()
+        except ApexApiError as e:
+            # 本进程产生的错误（排队超时、key 停用、熔断）没有请求上游，不写入共享缓存
+            if e.status_code is not None and not isinstance(e, LocalApiError):
+                self._try(self.write_failure, key, e.status_code, e.params)
+            raise
+        self._try(self.write, key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+    def _try(self, write, *args) -> None:
+        try:
+            write(*args)
+        except sqlite3.Error as e:
+            print(f"Apex Legends 插件：写入共享缓存失败：{str(e)}")
+
+    def _raise_failure(self, key: str) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, params FROM failures WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        if row is not None:
+            raise ApexApiError(row[0], json.loads(row[1]))
+
+    """
+    读取未过期的缓存，没有时返回 None
+    """
+    def read(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    """
+    写入缓存，并定期清理过期很久的条目
+    """
+    def write(self, key: str, value, ttl: float) -> None:
+        now = time.time()
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, blob, now + ttl, now))
+            self._conn.execute("DELETE FROM failures WHERE key = ?", (key,))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (now - SHARED_RETENTION_SECS,))
+                self._conn.execute("DELETE FROM failures WHERE expires_at < ?", (now,))
+
+    """
+    记录上游返回的错误（状态码和请求参数），SHARED_FAILURE_TTL 秒内读取该键时抛出同样的错误
+    """
+    def write_failure(self, key: str, status: int, params: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?)",
+                (key, status, json.dumps(params), time.time() + SHARED_FAILURE_TTL),
+            )
+
+    def _acquire_lease(self, key: str, owner: str) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT until FROM leases WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] > now:
+                    return False
+                self._conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (key, owner, now + SHARED_LEASE_SECS))
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def _release_lease(self, key: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PlayerIndex:
+    """
+    本地玩家索引：(平台, 玩家名) → UID，保存在 SQLite 中，插件重启后仍然有效
+    玩家名不区分大小写；同一个 UID 出现新名字时（玩家改名）旧名字会被替换
+    """
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS players ("
+            "platform TEXT NOT NULL, name_key TEXT NOT NULL, name TEXT NOT NULL, "
+            "uid TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (platform, name_key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS players_uid ON players (platform, uid)")
+        self._conn.commit()
+
+    """
+    查询玩家 UID，不存在时返回 None
+    """
+    def lookup(self, name: str, platform: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uid FROM players WHERE platform = ? AND name_key = ?", (platform, name.lower())
+            ).fetchone()
+        return row[0] if row else None
+
+    """
+    记录玩家名和 UID 的对应关系，并删除该 UID 的旧名字
+    """
+    def record(self, name: str, platform: str, uid) -> None:
+        if not name or not uid:
+            return
+        name_key, uid = name.lower(), str(uid)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name_key FROM players WHERE platform = ? AND uid = ?", (platform, uid)
+            ).fetchall()
+            if rows == [(name_key,)]:
+                return
+            self._conn.execute(
+                "DELETE FROM players WHERE platform = ? AND uid = ? AND name_key != ?", (platform, uid, name_key)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO players (platform, name_key, name, uid, updated) VALUES (?, ?, ?, ?, ?)",
+                (platform, name_key, name, uid, time.time()),
+            )
+            self._conn.commit()
+
+    """
+    返回最近记录的至多 limit 个玩家 [(平台, 玩家名, UID)]，按记录时间从早到晚排列
+    """
+    def names(self, limit: int) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT platform, name, uid FROM players ORDER BY updated DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return rows[::-1]
+
+    """
+    删除玩家名的记录（UID 已失效时使用）
+    """
+    def forget(self, name: str, platform: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM players WHERE platform = ? AND name_key = ?", (platform, name.lower()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NameIndex:
+    """
+    内存中的玩家名模糊索引，按平台保存见过的玩家名，用三元组（trigram）和前缀查找相近的名字
+    玩家名不区分大小写；超过 max_names 时淘汰最久没有出现的名字
+    """
+    def __init__(self, max_names: int = NAME_INDEX_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._names = OrderedDict()  # (平台, 小写玩家名) → (玩家名, UID)
+        self._grams = {}  # (平台, 三元组) → {小写玩家名}
+        self._sorted = {}  # 平台 → 排序后的小写玩家名，用于前缀查找
+        self.max_names = max_names
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._names)
+
+    """
+    记录玩家名（UID 可以为空），已存在时更新 UID 并标记为最近出现
+    """
+    def add(self, name: str, platform: str, uid=None) -> None:
+        if not name:
+            return
+        key, uid = (platform, name.lower()), (str(uid) if uid else None)
+        with self._lock:
+            entry = self._names.get(key)
+            if entry is not None:
+                self._names[key] = (name, uid or entry[1])
+                self._names.move_to_end(key)
+                return
+            self._names[key] = (name, uid)
+            for gram in self._trigrams(key[1]):
+                self._grams.setdefault((platform, gram), set()).add(key[1])
+            insort(self._sorted.setdefault(platform, []), key[1])
+            while len(self._names) > self.max_names:
+                self._drop(*self._names.popitem(last=False)[0])
+
+    """
+    精确查找玩家名（不区分大小写），返回 (玩家名, UID)，不存在时返回 None
+    """
+    def get(self, name: str, platform: str):
+        with self._lock:
+            return self._names.get((platform, name.lower()))
+
+    """
+    返回与 name 最相近的至多 limit 个已知玩家名
+    候选为与 name 的三元组相似度（Jaccard）不低于 NAME_SUGGEST_MIN_SIMILARITY，或以 name 开头的名字；
+    按相似度排序，相似度相同时编辑距离较小的在前
+    """
+    def suggest(self, name: str, platform: str, limit: int = NAME_SUGGEST_LIMIT) -> list:
+        name_key = name.lower()
+        grams = self._trigrams(name_key)
+        with self._lock:
+            shared = {}
+            for gram in grams:
+                for candidate in self._grams.get((platform, gram), ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            scores = {}
+            for candidate, count in shared.items():
+                # Jaccard 相似度不可能超过 共同三元组数 / 输入的三元组数，先用它过滤掉大部分候选
+                if count < NAME_SUGGEST_MIN_SIMILARITY * len(grams):
+                    continue
+                score = count / (len(grams) + len(self._trigrams(candidate)) - count)
+                if score >= NAME_SUGGEST_MIN_SIMILARITY:
+                    scores[candidate] = score
+            names = self._sorted.get(platform, [])
+            start = bisect_left(names, name_key)
+            for candidate in names[start:start + limit + 1]:
+                if candidate.startswith(name_key):
+                    scores[candidate] = max(scores.get(candidate, 0), NAME_SUGGEST_MIN_SIMILARITY)
+            scores.pop(name_key, None)
+            best = heapq.nlargest(limit * 4, scores.items(), key=lambda item: item[1])
+            ranked = sorted(best, key=lambda item: (-item[1], self._distance(name_key, item[0]), item[0]))
+            return [self._names[(platform, candidate)][0] for candidate, _ in ranked[:limit]]
+
+    def _drop(self, platform: str, name_key: str) -> None:
+        for gram in self._trigrams(name_key):
+            names = self._grams.get((platform, gram))
+            names.discard(name_key)
+            if not names:
+                del self._grams[(platform, gram)]
+        names = self._sorted[platform]
+        del names[bisect_left(names, name_key)]
+
+    def _trigrams(self, name_key: str) -> set:
+        padded = f"  {name_key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def _distance(self, a: str, b: str) -> int:
+        previous = list(range(len(b) + 1))
+        for i, char_a in enumerate(a, 1):
+            current = [i]
+            for j, char_b in enumerate(b, 1):
+                current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+            previous = current
+        return previous[-1]
+
+
+class SnapshotStore:
+    """
+    玩家数据快照的时间序列存储（SQLite，只追加）
+    以 (uid, ts) 为主键的 WITHOUT ROWID 表，数据按玩家和时间聚簇存放，按玩家查询历史只需一次范围扫描
+    与上一条快照完全相同的数据不会重复写入
+    """
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "uid TEXT NOT NULL, ts INTEGER NOT NULL, level INTEGER, rank_score INTEGER, "
+            "kills INTEGER, damage INTEGER, PRIMARY KEY (uid, ts)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    """
+    追加一条快照，和该玩家最近一条快照相同时跳过
+    """
+    def append(self, uid, level, rank_score, kills, damage, ts: int = None) -> None:
+        if not uid:
+            return
+        uid, ts = str(uid), int(ts or time.time())
+        row = (level, rank_score, kills, damage)
+        with self._lock:
+            last = self._conn.execute(
+                "SELECT level, rank_score, kills, damage FROM snapshots WHERE uid = ? ORDER BY ts DESC LIMIT 1", (uid,)
+            ).fetchone()
+            if last == row:
+                return
+            self._conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)", (uid, ts) + row)
+            self._conn.commit()
+
+    """
+    读取玩家最近 limit 条快照，按时间升序返回 [(ts, level, rank_score, kills, damage), ...]
+    """
+    def history(self, uid, limit: int = TREND_MAX_SNAPSHOTS) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, level, rank_score, kills, damage FROM snapshots WHERE uid = ? ORDER BY ts DESC LIMIT ?",
+                (str(uid), limit),
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WatchList:
+    """
+    关注列表：被关注的玩家、关注他们的群（或私聊用户），以及每个玩家最后一次轮询到的状态，保存在 SQLite 中
+    轮询时间只保存在内存中：在线的玩家每 WATCH_FAST_SECS 秒轮询一次，离线时间隔翻倍直到 WATCH_MAX_SECS；
+    插件重启后所有玩家都会尽快轮询一次
+    """
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_players ("
+            "platform TEXT NOT NULL, uid TEXT NOT NULL, name TEXT NOT NULL, state TEXT, PRIMARY KEY (platform, uid))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_targets ("
+            "platform TEXT NOT NULL, uid TEXT NOT NULL, target TEXT NOT NULL, PRIMARY KEY (platform, uid, target))"
+        )
+        self._conn.commit()
+        # {(平台, UID): [玩家名, 状态, 关注者集合]} 和 {(平台, UID): (下次轮询时间, 当前间隔)}
+        self._players = {}
+        self._schedule = {}
+        now = time.time()
+        for platform, uid, name, state in self._conn.execute("SELECT platform, uid, name, state FROM watch_players"):
+            self._players[(platform, uid)] = [name, json.loads(state) if state else None, set()]
+            self._schedule[(platform, uid)] = (now, WATCH_FAST_SECS)
+        for platform, uid, target in self._conn.execute("SELECT platform, uid, target FROM watch_targets"):
+            if (platform, uid) in self._players:
+                self._players[(platform, uid)][2].add(target)
+
+    """
+    关注玩家，已经关注时返回 False
+    """
+    def add(self, target: str, platform: str, uid: str, name: str) -> bool:
+        key = (platform, uid)
+        with self._lock:
+            player = self._players.get(key)
+            if player is not None and target in player[2]:
+                return False
+            if player is None:
+                player = self._players[key] = [name, None, set()]
+                self._schedule[key] = (time.time(), WATCH_FAST_SECS)
+                self._conn.execute("INSERT OR REPLACE INTO watch_players VALUES (?, ?, ?, NULL)", (platform, uid, name))
+            player[2].add(target)
+            self._conn.execute("INSERT OR IGNORE INTO watch_targets VALUES (?, ?, ?)", (platform, uid, target))
+            self._conn.commit()
+            return True
+
+    """
+    取消关注，没有关注时返回 False。玩家没有关注者后不再轮询
+    """
+    def remove(self, target: str, platform: str, uid: str) -> bool:
+        key = (platform, uid)
+        with self._lock:
+            player = self._players.get(key)
+            if player is None or target not in player[2]:
+                return False
+            player[2].discard(target)
+            self._conn.execute("DELETE FROM watch_targets WHERE platform = ? AND uid = ? AND target = ?", (platform, uid, target))
+            if not player[2]:
+                del self._players[key]
+                del self._schedule[key]
+                self._conn.execute("DELETE FROM watch_players WHERE platform = ? AND uid = ?", (platform, uid))
+            self._conn.commit()
+            return True
+
+    """
+    返回关注者关注的玩家 [(平台, UID, 玩家名)]
+    """
+    def watched_by(self, target: str) -> list:
+        with self._lock:
+            return sorted((platform, uid, player[0]) for (platform, uid), player in self._players.items() if target in player[2])
+
+    """
+    返回关注该玩家的群和用户
+    """
+    def targets(self, platform: str, uid: str) -> list:
+        with self._lock:
+            player = self._players.get((platform, uid))
+            return sorted(player[2]) if player else []
+
+    """
+    玩家最后一次轮询到的状态，还没有轮询过时返回 None
+    """
+    def state(self, platform: str, uid: str):
+        with self._lock:
+            player = self._players.get((platform, uid))
+            return player[1] if player else None
+
+    """
+    返回已到轮询时间的玩家 [(平台, UID)]，等待最久的在前
+    """
+    def due(self, now: float = None) -> list:
+        now = time.time() if now is None else now
+        with self._lock:
+            due = [(at, key) for key, (at, _) in self._schedule.items() if at <= now]
+        due.sort()
+        return [key for _, key in due]
+
+    """
+    保存轮询结果并安排下一次轮询：active（在线或游戏中）时使用最短间隔，否则间隔翻倍
+    """
+    def update(self, platform: str, uid: str, name: str, state: dict, active: bool) -> None:
+        key = (platform, uid)
+        with self._lock:
+            player = self._players.get(key)
+            if player is None:
+                return
+            player[0], player[1] = name or player[0], state
+            self._conn.execute(
+                "UPDATE watch_players SET name = ?, state = ? WHERE platform = ? AND uid = ?",
+                (player[0], json.dumps(state), platform, uid),
+            )
+            self._conn.commit()
+        self.postpone(platform, uid, reset=active)
+
+    """
+    推迟玩家的下一次轮询（本次没有取到数据时也会调用），reset 为 True 时恢复最短间隔
+    """
+    def postpone(self, platform: str, uid: str, reset: bool = False) -> None:
+        key = (platform, uid)
+        with self._lock:
+            if key not in self._schedule:
+                return
+            _, interval = self._schedule[key]
+            interval = WATCH_FAST_SECS if reset else min(interval * 2, WATCH_MAX_SECS)
+            self._schedule[key] = (time.time() + interval, interval)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._players)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RankSnapshot:
+    """
+    排行榜 / 猎杀者排行榜的排序索引
+    每个平台的分数保存在升序的 array 中，任意分数的名次用二分查找在 O(log n) 内得出
+    """
+    def __init__(self, data) -> None:
+        self.scores = {}
+        self.thresholds = {}
+        if not isinstance(data, dict):
+            return
+        for platform, entries in data.items():
+            if not isinstance(entries, list):
+                continue
+            scores = []
+            for entry in entries:
+                try:
+                    scores.append(int(entry.get("rank", {}).get("rankScore", 0)))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            scores.sort()
+            self.scores[platform] = array("l", scores)
+        # /predator 的 RP 字段直接给出各平台猎杀者的最低分数
+        rp = data.get("RP")
+        if isinstance(rp, dict):
+            for platform, info in rp.items():
+                if isinstance(info, dict) and isinstance(info.get("val"), (int, float)):
+                    self.thresholds[platform] = int(info["val"])
+
+    """
+    返回分数在该平台的 (名次, 总人数)，没有该平台数据时返回 None
+    """
+    def position(self, platform: str, score: int):
+        scores = self.scores.get(platform)
+        if not scores:
+            return None
+        return len(scores) - bisect_right(scores, score) + 1, len(scores)
+
+    """
+    返回该平台进入榜单的最低分数：优先使用接口给出的门槛，否则为榜单中的最低分
+    """
+    def threshold(self, platform: str):
+        if platform in self.thresholds:
+            return self.thresholds[platform]
+        return self.lowest(platform)
+
+    """
+    返回该平台榜单中的最低分数
+    """
+    def lowest(self, platform: str):
+        scores = self.scores.get(platform)
+        return scores[0] if scores else None
+
+
+class PrefetchScheduler:
+    """
+    后台预取调度器
+    在独立线程中按计划时间调用 refresh(key)，refresh 返回下一次刷新的时间（unix 时间戳），返回 None 则不再刷新
+    """
+    def __init__(self, refresh) -> None:
+        self._refresh = refresh
+        self._heap = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    """
+    安排 key 在 at 时刻刷新
+    """
+    def schedule(self, key: str, at: float) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (at, key))
+            self._cond.notify()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="apexlegends-prefetch", daemon=True)
+        self._thread.start()
+
+    """
+    停止调度线程，等待正在进行的刷新结束
+    """
+    def stop(self, timeout: float = 5) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.time()):
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if self._stopped:
+                    return
+                _, key = heapq.heappop(self._heap)
+            try:
+                next_at = self._refresh(key)
+            except Exception as e:
+                print(f"Apex Legends 插件：预取 {key} 失败：{str(e)}")
+                next_at = time.time() + PREFETCH_RETRY_SECS
+            if next_at is not None:
+                self.schedule(key, next_at)
+
+
+class FloodGuard:
+    """
+    防刷屏
+    同一群在 group_window 秒内、同一用户在 user_window 秒内重复的指令返回上一次的回复，不再查询上游；
+    每个用户有独立的令牌桶配额（每秒 user_rate 次，最多积攒 user_burst 次）
+    每个群和用户只保存最后一条指令的回复和一个令牌桶，按最后活动时间排序，过期或空闲后从最旧的一端淘汰
+    """
+    def __init__(self, group_window: float = 10, user_window: float = 30,
+                 user_rate: float = 0.2, user_burst: int = 5) -> None:
+        self.group_window = group_window
+        self.user_window = user_window
+        self.user_rate = user_rate
+        self.user_burst = max(1, user_burst)
+        self._lock = threading.Lock()
+        # {("group" / "user", ID): (指令, 回复, 时间)}
+        self._recent = OrderedDict()
+        # {用户 ID: (令牌数, 更新时间)}，令牌桶补满后就可以淘汰
+        self._buckets = OrderedDict()
+
+    """
+    查找窗口内相同指令的回复，没有时返回 None
+    """
+    def recent(self, group, user, command: str):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            for scope, source, window in (("group", group, self.group_window), ("user", user, self.user_window)):
+                entry = self._recent.get((scope, source)) if source else None
+                if entry is not None and entry[0] == command and now - entry[2] < window:
+                    return entry[1]
+        return None
+
+    """
+    记录群和用户最后一条指令的回复
+    """
+    def remember(self, group, user, command: str, reply) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for scope, source, window in (("group", group, self.group_window), ("user", user, self.user_window)):
+                if source and window > 0:
+                    self._recent[(scope, source)] = (command, reply, now)
+                    self._recent.move_to_end((scope, source))
+
+    """
+    消耗用户的一次配额。成功返回 0，配额不足时返回需要等待的秒数
+    """
+    def acquire(self, user) -> float:
+        if not user or self.user_rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            tokens, updated = self._buckets.pop(user, (self.user_burst, now))
+            tokens = min(self.user_burst, tokens + (now - updated) * self.user_rate)
+            if tokens < 1:
+                self._buckets[user] = (tokens, now)
+                return (1 - tokens) / self.user_rate
+            self._buckets[user] = (tokens - 1, now)
+            return 0.0
+
+    def _evict(self, now: float) -> None:
+        window = max(self.group_window, self.user_window)
+        while self._recent and now - next(iter(self._recent.values()))[2] >= window:
+            self._recent.popitem(last=False)
+        if self.user_rate > 0:
+            idle = self.user_burst / self.user_rate
+            while self._buckets and now - next(iter(self._buckets.values()))[1] >= idle:
+                self._buckets.popitem(last=False)
+
+
 class ApexLegendsPlugin:
     """
     初始化函数
     """
     def __init__(self) -> None:
-        self.api_base_url = "https://api.mozambiquehe.re"
-        # 优先从环境变量读取 API key
-        self.api_key = os.getenv("APEX_LEGENDS_API_KEY", None)
-        
-        # 如果环境变量没有，尝试从配置文件读取
-        if not self.api_key:
-            try:
-                import config
-                self.api_key = getattr(config, "APEX_LEGENDS_API_KEY", None)
-            except ImportError:
-                pass
-        
-        if not self.api_key:
+        self.api_base_url = load_setting("APEX_API_BASE_URL", "https://api.mozambiquehe.re")
+        # 全局数据缓存，所有用户共享
+        self._cache = ResponseCache()
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        # 排行榜排序索引：{接口: (数据摘要, RankSnapshot)}，数据更新后重建
+        self._rank_indexes = {}
+        # 全局指令的渲染结果：{(渲染函数名, 数据摘要): 回复文本}
+        self._rendered = {}
+        # 优先从环境变量读取 API key，其次从配置文件读取；可以配置多个 key 分担请求
+        self.api_keys = self._load_api_keys()
+        # 统计指标，apex stats 和 Prometheus 导出使用
+        self._metrics = Metrics()
+        self._started_at = time.time()
+        self.metrics_file = load_setting("APEX_METRICS_FILE", "")
+        # HTTP 客户端、玩家索引和快照存储在第一次使用时才创建（见 _client / _players / _snapshots），加快插件加载
+        self._lazy_lock = threading.RLock()
+        self._api_client = None
+        self._player_index = None
+        self._snapshot_store = None
+        self._watch_store = None
+        self._name_index = None
+        # 最近返回 404 的玩家名及其记录时间（秒），时间内重复查询直接回复未找到，不再请求上游；为 0 时不记录
+        self.name_miss_ttl = load_setting("APEX_NAME_MISS_TTL", 300)
+        self._missing_names = ResponseCache(NAME_MISS_SIZE)
+        # 多个机器人进程共享的响应缓存（SQLite 文件路径），留空则不共享
+        self.shared_cache_path = load_setting("APEX_SHARED_CACHE", "")
+        self._shared_store = None
+        # 防刷屏：重复指令的去重窗口（秒）和每个用户每分钟的查询次数
+        self._flood = FloodGuard(
+            group_window=load_setting("APEX_GROUP_DEDUP_SECS", 10.0),
+            user_window=load_setting("APEX_USER_DEDUP_SECS", 30.0),
+            user_rate=load_setting("APEX_USER_QUERIES_PER_MIN", 10.0) / 60,
+            user_burst=load_setting("APEX_USER_BURST", 5),
+        )
+        # 关注列表轮询使用的固定配额（每分钟的 /bridge 请求数），每次请求最多批量查询 MAX_BATCH_PLAYERS 名玩家
+        watch_rate = load_setting("APEX_WATCH_REQUESTS_PER_MIN", 6.0) / 60
+        self._watch_budget = RateLimiter(watch_rate, int(watch_rate * WATCH_TICK_SECS) + 1) if watch_rate > 0 else None
+        # 关注动态的推送：设置了 notifier 时直接发送，否则排队，随该群（或私聊用户）的下一条回复发出
+        self._notifier = None
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # 最近一次成功获取的玩家数据，上游不可用时用于兜底：{(平台, 小写玩家名): 玩家数据}
+        self._last_players = ResponseCache(PLAYER_FALLBACK_SIZE)
+        # run_async 使用的线程池，限制同时进行的查询数
+        self._executor = ThreadPoolExecutor(
+            max_workers=load_setting("APEX_MAX_CONCURRENCY", 8),
+            thread_name_prefix="apexlegends",
+        )
+        # 批量查询时并发发出子请求的线程池（与 _executor 分开，避免在线程池内等待自身导致死锁）
+        self._fanout = ThreadPoolExecutor(max_workers=MAX_BATCH_PLAYERS, thread_name_prefix="apexlegends-fanout")
+
+        if not self.api_keys:
             print("警告：未设置 APEX_LEGENDS_API_KEY，部分功能可能无法使用")
             print("提示：可通过环境变量或 config.py 文件设置 API key")
-        else:
+        elif len(self.api_keys) == 1:
             print("Apex Legends 插件已加载！API key 已配置")
+        else:
+            print(f"Apex Legends 插件已加载！已配置 {len(self.api_keys)} 个 API key")
+
+        # 本地数据目录，保存玩家索引等持久化数据
+        self.data_dir = load_setting("APEX_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+        # 从上次运行保存的快照恢复缓存，重启后的第一批查询也能命中缓存（条目在第一次读取时才解析）
+        self._cache_snapshot = None
+        if load_setting("APEX_CACHE_SNAPSHOT", True):
+            self._cache_snapshot = CacheSnapshot(os.path.join(self.data_dir, "cache.snapshot"))
+            self._restore_caches()
+
+        # 后台任务：预取全局数据，让地图轮换等查询总是命中缓存；轮询关注列表；定期导出统计指标和保存缓存快照
+        self._scheduler = None
+        prefetch = bool(self.api_keys) and load_setting("APEX_PREFETCH", True)
+        watch = bool(self.api_keys) and self._watch_budget is not None
+        if prefetch or watch or self.metrics_file or self._cache_snapshot is not None:
+            self._scheduler = PrefetchScheduler(self._run_scheduled)
+            now = time.time()
+            if prefetch:
+                for endpoint in PREFETCH_ROTATING + PREFETCH_PERIODIC:
+                    # 快照中还新鲜的数据在过期时才预取（只读取过期时间，不解析数据）
+                    expires = self._cache.expires(endpoint)
+                    fresh = expires is not None and expires > now
+                    self._scheduler.schedule(endpoint, expires + random.uniform(0, PREFETCH_JITTER_SECS) if fresh else now)
+            if self.metrics_file:
+                self._scheduler.schedule("metrics", now + METRICS_EXPORT_INTERVAL)
+            if self._cache_snapshot is not None:
+                self._scheduler.schedule("snapshot", now + CACHE_SNAPSHOT_INTERVAL)
+            if watch:
+                self._scheduler.schedule("watch", now + WATCH_TICK_SECS)
+            self._scheduler.start()
+
+    """
+    插件卸载时调用，停止后台线程并释放连接
+    """
+    def terminate(self):
+        if self._scheduler is not None:
+            self._scheduler.stop()
+        if self.metrics_file:
+            self._export_metrics()
+        if self._cache_snapshot is not None:
+            self._save_caches()
+            self._cache_snapshot.close()
+        self._executor.shutdown(wait=False)
+        self._fanout.shutdown(wait=False)
+        if self._api_client is not None:
+            self._api_client.close()
+        if self._player_index is not None:
+            self._player_index.close()
+        if self._snapshot_store is not None:
+            self._snapshot_store.close()
+        if self._watch_store is not None:
+            self._watch_store.close()
+        if self._shared_store is not None:
+            self._shared_store.close()
+
+    """
+    设置关注动态的推送函数 callback(目标类型, 目标 ID, 文本)，目标类型为 group 或 user，返回真值表示已发送
+    没有设置或发送失败时，动态会随该群（或私聊用户）的下一条回复发出
+    """
+    def set_notifier(self, callback) -> None:
+        self._notifier = callback
+
+    """
+    读取 API key 列表：APEX_LEGENDS_API_KEYS（环境变量中用逗号分隔，config.py 中为列表）和 APEX_LEGENDS_API_KEY，去重后返回
+    """
+    def _load_api_keys(self) -> list:
+        keys = load_setting("APEX_LEGENDS_API_KEYS", "")
+        if isinstance(keys, str):
+            keys = keys.split(",")
+        keys = [load_setting("APEX_LEGENDS_API_KEY", "")] + list(keys)
+        return list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+
+    """
+    所有查询共享的 HTTP 客户端
+    """
+    @property
+    def _client(self) -> ApexApiClient:
+        return self._lazy("_api_client", self._create_client)
+
+    """
+    玩家名 → UID 的本地索引
+    """
+    @property
+    def _players(self) -> PlayerIndex:
+        return self._lazy("_player_index", self._open_player_index)
+
+    """
+    玩家数据快照存储
+    """
+    @property
+    def _snapshots(self) -> SnapshotStore:
+        return self._lazy("_snapshot_store", self._open_snapshot_store)
+
+    """
+    跨进程共享缓存，无法打开时为 None
+    """
+    @property
+    def _shared(self) -> SharedCache:
+        return self._lazy("_shared_store", self._open_shared_cache)
+
+    """
+    玩家名模糊索引，用于未找到玩家时提示相近的名字
+    """
+    @property
+    def _names(self) -> NameIndex:
+        return self._lazy("_name_index", self._open_name_index)
+
+    """
+    关注列表
+    """
+    @property
+    def _watchlist(self) -> WatchList:
+        return self._lazy("_watch_store", self._open_watchlist)
+
+    """
+    返回属性 attr 的值，为 None 时调用 factory 创建（多个线程同时访问时只创建一次）
+    factory 中可以访问其他延迟创建的属性（例如模糊索引从玩家索引载入），因此使用可重入锁
+    """
+    def _lazy(self, attr: str, factory):
+        value = getattr(self, attr)
+        if value is None:
+            with self._lazy_lock:
+                value = getattr(self, attr)
+                if value is None:
+                    value = factory()
+                    setattr(self, attr, value)
+        return value
+
+    def _create_client(self) -> ApexApiClient:
+        return ApexApiClient(
+            self.api_base_url,
+            self.api_keys,
+            pool_size=load_setting("APEX_HTTP_POOL_SIZE", 10),
+            connect_timeout=load_setting("APEX_CONNECT_TIMEOUT", 3.05),
+            read_timeout=load_setting("APEX_READ_TIMEOUT", 10.0),
+            rate_limit=load_setting("APEX_RATE_LIMIT", 2.0),
+            rate_burst=load_setting("APEX_RATE_BURST", 2),
+            queue_timeout=load_setting("APEX_QUEUE_TIMEOUT", 5.0),
+            breaker_failures=load_setting("APEX_BREAKER_FAILURES", 5),
+            breaker_cooldown=load_setting("APEX_BREAKER_COOLDOWN", 30.0),
+            slow_threshold=load_setting("APEX_SLOW_THRESHOLD", 5.0),
+            hedge=load_setting("APEX_HEDGE", False),
+            metrics=self._metrics,
+        )
+
+    """
+    从缓存快照恢复全局数据缓存和玩家兜底数据
+    """
+    def _restore_caches(self) -> None:
+        # 全局缓存的值是 (数据, 数据摘要)，JSON 中保存为列表
+        caches = self._cache_snapshot.load({"global": tuple})
+        self._cache.restore(caches.get("global", []))
+        self._last_players.restore(caches.get("players", []))
+
+    """
+    把全局数据缓存和玩家兜底数据保存为缓存快照
+    """
+    def _save_caches(self) -> None:
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            self._cache_snapshot.save({"global": self._cache, "players": self._last_players})
+        except OSError as e:
+            print(f"Apex Legends 插件：保存缓存快照失败：{str(e)}")
+
+    """
+    打开玩家索引。数据目录不可写时退回到内存数据库，只在本次运行中有效
+    """
+    def _open_player_index(self) -> PlayerIndex:
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            return PlayerIndex(os.path.join(self.data_dir, "players.db"))
+        except (OSError, sqlite3.Error) as e:
+            print(f"警告：无法打开玩家索引（{str(e)}），将只在内存中保存")
+            return PlayerIndex(":memory:")
+
+    """
+    创建玩家名模糊索引，并载入本地玩家索引中最近记录的玩家名
+    """
+    def _open_name_index(self) -> NameIndex:
+        index = NameIndex()
+        for platform, name, uid in self._players.names(NAME_INDEX_SIZE):
+            index.add(name, platform, uid)
+        return index
+
+    """
+    打开玩家快照存储，数据目录不可写时同样退回到内存数据库
+    """
+    def _open_snapshot_store(self) -> SnapshotStore:
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            return SnapshotStore(os.path.join(self.data_dir, "snapshots.db"))
+        except (OSError, sqlite3.Error) as e:
+            print(f"警告：无法打开玩家快照存储（{str(e)}），将只在内存中保存")
+            return SnapshotStore(":memory:")
+
+    """
+    打开共享缓存。无法打开时关闭共享，之后直接请求上游
+    """
+    def _open_shared_cache(self):
+        try:
+            directory = os.path.dirname(os.path.abspath(self.shared_cache_path))
+            os.makedirs(directory, exist_ok=True)
+            return SharedCache(self.shared_cache_path, wait_timeout=load_setting("APEX_QUEUE_TIMEOUT", 5.0)
+                               + load_setting("APEX_READ_TIMEOUT", 10.0))
+        except (OSError, sqlite3.Error) as e:
+            print(f"警告：无法打开共享缓存（{str(e)}），将不与其他实例共享数据")
+            self.shared_cache_path = ""
+            return None
+
+    """
+    打开关注列表，数据目录不可写时同样退回到内存数据库
+    """
+    def _open_watchlist(self) -> WatchList:
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            return WatchList(os.path.join(self.data_dir, "watch.db"))
+        except (OSError, sqlite3.Error) as e:
+            print(f"警告：无法打开关注列表（{str(e)}），将只在内存中保存")
+            return WatchList(":memory:")
 
     """
     机器人程序会调用此函数。
@@ -52,7 +2133,7 @@ class ApexLegendsPlugin:
         message = ame.message_str.strip()
         
         # 检查是否是 Apex 相关指令
-        if not message.startswith("apex") and not message.startswith("Apex") and not message.startswith("APEX"):
+        if not self._is_apex_command(message):
             return False, None
         
         # 解析指令
@@ -61,6 +2142,40 @@ class ApexLegendsPlugin:
             return True, tuple([False, "用法：apex <指令> [参数]\n输入 'apex help' 查看帮助", "apexlegends"])
         
         command = parts[1].lower()
+        group, user = self._message_source(ame)
+        if command in ("help", "stats"):
+            reply = self._execute(ame, parts)
+        else:
+            reply = self._execute_guarded(ame, parts, group, user)
+        return self._attach_notifications(reply, self._watch_target(group, user))
+
+    """
+    防刷屏：同一群或同一用户在窗口内重复的指令直接返回上一次的回复，每个用户的查询次数受配额限制
+    TARGETED_COMMANDS 的结果与所在群有关，同一用户在不同群发送时不能复用，因此不去重
+    """
+    def _execute_guarded(self, ame: AstrMessageEvent, parts: list, group, user):
+        key = " ".join(part.lower() for part in parts)
+        dedup = parts[1].lower() not in TARGETED_COMMANDS
+        reply = self._flood.recent(group, user, key) if dedup else None
+        if reply is not None:
+            self._metrics.inc("apex_flood_total", {"result": "duplicate"})
+            return reply
+        if not self._is_admin(ame):
+            wait = self._flood.acquire(user)
+            if wait > 0:
+                self._metrics.inc("apex_flood_total", {"result": "throttled"})
+                return True, tuple([False, f"查询过于频繁，请 {int(wait) + 1} 秒后再试", "apexlegends"])
+        reply = self._execute(ame, parts)
+        if dedup and reply[1] is not None and reply[1][0]:
+            self._flood.remember(group, user, key, reply)
+        return reply
+
+    """
+    执行一条已解析的指令，返回 run 规定的结果
+    """
+    def _execute(self, ame: AstrMessageEvent, parts: list):
+        command = parts[1].lower()
+        started = time.perf_counter()
         
         try:
             if command == "help":
@@ -71,6 +2186,12 @@ class ApexLegendsPlugin:
                 player_name = parts[2]
                 platform = parts[3].upper()
                 return self._query_player(player_name, platform)
+            elif command == "players" or command == "ps":
+                if len(parts) < 4:
+                    return True, tuple([False, "用法：apex players <玩家名1,玩家名2,...> <平台(PC/PS4/X1)>", "apexlegends"])
+                player_names = [name for name in parts[2].split(",") if name]
+                platform = parts[3].upper()
+                return self._query_players(player_names, platform)
             elif command == "uid":
                 if len(parts) < 3:
                     return True, tuple([False, "用法：apex uid <玩家名> <平台(PC/PS4/X1)>", "apexlegends"])
@@ -83,6 +2204,17 @@ class ApexLegendsPlugin:
                 player_name = parts[2]
                 platform = parts[3].upper()
                 return self._query_matches(player_name, platform)
+            elif command == "trend":
+                if len(parts) < 4:
+                    return True, tuple([False, "用法：apex trend <玩家名> <平台(PC/PS4/X1)>", "apexlegends"])
+                player_name = parts[2]
+                platform = parts[3].upper()
+                return self._query_trend(player_name, platform)
+            elif command == "rank":
+                if len(parts) < 3 or not parts[2].isdigit():
+                    return True, tuple([False, "用法：apex rank <排位分数> <平台(PC/PS4/X1)>", "apexlegends"])
+                platform = parts[3].upper() if len(parts) > 3 else "PC"
+                return self._query_rank_position(int(parts[2]), platform)
             elif command == "leaderboard" or command == "lb":
                 return self._query_leaderboard()
             elif command == "map" or command == "maps":
@@ -97,10 +2229,88 @@ class ApexLegendsPlugin:
                 return self._query_server_status()
             elif command == "predator":
                 return self._query_predator()
+            elif command == "watch" or command == "unwatch":
+                if len(parts) < 4:
+                    return True, tuple([False, f"用法：apex {command} <玩家名> <平台(PC/PS4/X1)>", "apexlegends"])
+                player_name = parts[2]
+                platform = parts[3].upper()
+                if command == "watch":
+                    return self._watch_player(ame, player_name, platform)
+                return self._unwatch_player(ame, player_name, platform)
+            elif command == "watchlist":
+                return self._show_watchlist(ame)
+            elif command == "stats":
+                if not self._is_admin(ame):
+                    return True, tuple([False, "该指令仅管理员可用", "apexlegends"])
+                return self._show_stats()
             else:
                 return True, tuple([False, f"未知指令：{command}\n输入 'apex help' 查看帮助", "apexlegends"])
+        except ApexApiError as e:
+            return self._api_error_reply(e)
+        except requests.exceptions.RequestException as e:
+            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
         except Exception as e:
             return True, tuple([False, f"查询出错：{str(e)}", "apexlegends"])
+        finally:
+            label = command if command in COMMANDS else "other"
+            self._metrics.observe("apex_command_seconds", {"command": label}, time.perf_counter() - started)
+
+    """
+    run 的异步版本，供基于 asyncio 的机器人调用
+    查询在有界线程池中执行，不会阻塞事件循环；同时进行的查询数由 APEX_MAX_CONCURRENCY 限制
+    """
+    async def run_async(self, ame: AstrMessageEvent):
+        # 非 Apex 指令直接返回，不占用线程池
+        if not self._is_apex_command(ame.message_str.strip()):
+            return False, None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.run, ame)
+
+    def _is_apex_command(self, message: str) -> bool:
+        return message.startswith("apex") or message.startswith("Apex") or message.startswith("APEX")
+
+    def _is_admin(self, ame: AstrMessageEvent) -> bool:
+        return getattr(ame, "role", None) == "admin"
+
+    """
+    取出消息来源的 (群/频道 ID, 用户 ID)，私聊时群 ID 为 None，无法识别时为 None
+    支持 nakuru 的 GroupMessage / FriendMessage 和 botpy 的 Message / DirectMessage
+    """
+    def _message_source(self, ame: AstrMessageEvent):
+        message = getattr(ame, "message_obj", None)
+        if message is None:
+            return None, None
+        group = getattr(message, "group_id", None) or getattr(message, "channel_id", None)
+        if isinstance(message, DirectMessage):
+            # 频道私信的 channel_id 不是群，不共享回复
+            group = None
+        user = getattr(message, "user_id", None)
+        if user is None:
+            sender = getattr(message, "sender", None) or getattr(message, "author", None)
+            user = getattr(sender, "user_id", None) or getattr(sender, "id", None)
+        return (str(group) if group else None), (str(user) if user else None)
+
+    """
+    将上游 API 的错误转换为回复消息
+    """
+    def _api_error_reply(self, error: ApexApiError):
+        if error.status_code is None:
+            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        if error.status_code == 404 and error.params.get("player"):
+            player_name = error.params.get("player")
+            platform = error.params.get("platform", "PC")
+            text = f"未找到玩家：{player_name} (平台: {platform})"
+            suggestions = self._names.suggest(player_name, platform)
+            if suggestions:
+                text += "\n你是不是要找：" + "、".join(suggestions)
+            return True, tuple([False, text, "apexlegends"])
+        if error.status_code == 403:
+            return True, tuple([False, "API key 无效或未授权", "apexlegends"])
+        if error.status_code == 429:
+            return True, tuple([False, "查询人数过多，请稍后再试", "apexlegends"])
+        if isinstance(error, CircuitOpenError):
+            return True, tuple([False, "Apex API 暂时不可用，请稍后再试", "apexlegends"])
+        return True, tuple([False, f"查询失败：{error.status_code}", "apexlegends"])
 
     """
     显示帮助信息
@@ -110,8 +2320,10 @@ class ApexLegendsPlugin:
 
 可用指令：
 • apex player <玩家名> <平台> - 查询玩家统计信息
+• apex players <玩家名1,玩家名2,...> <平台> - 批量查询并对比玩家
 • apex uid <玩家名> <平台> - 查询玩家 UID
 • apex matches <玩家名> <平台> - 查询匹配历史
+• apex trend <玩家名> <平台> - 查询玩家数据趋势（基于本地记录）
 • apex leaderboard - 查询排行榜
 • apex map - 查询地图轮换
 • apex store - 查询商店
@@ -119,6 +2331,11 @@ class ApexLegendsPlugin:
 • apex news - 查询新闻
 • apex status - 查询服务器状态
 • apex predator - 查询猎杀者排行榜
+• apex rank <排位分数> <平台> - 查询分数对应的排名和猎杀者差距
+• apex watch <玩家名> <平台> - 关注玩家，段位、分数、等级和在线状态变化时通知
+• apex unwatch <玩家名> <平台> - 取消关注
+• apex watchlist - 查看本群关注的玩家
+• apex stats - 查看插件运行统计（仅管理员）
 
 平台选项：PC, PS4, X1
 注意：使用前需要配置 API key"""
@@ -128,29 +2345,117 @@ class ApexLegendsPlugin:
     查询玩家统计信息
     """
     def _query_player(self, player_name: str, platform: str):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
-        
-        url = f"{self.api_base_url}/bridge"
-        params = {
-            "auth": self.api_key,
-            "player": player_name,
-            "platform": platform
-        }
-        
+        data, age = self._fetch_player(player_name, platform)
+        started = time.perf_counter()
+        succeeded, text, name = self._format_player_stats(data, player_name, platform)[1]
+        self._metrics.observe("apex_render_seconds", {"renderer": "_format_player_stats"}, time.perf_counter() - started)
+        if succeeded and age is not None:
+            text = self._stale_note(age) + "\n\n" + text
+        return True, tuple([succeeded, text, name])
+
+    """
+    获取玩家完整数据（/bridge），返回 (数据, 数据年龄)
+    本地索引中有该玩家的 UID 时按 UID 查询，省去上游解析玩家名；UID 失效时退回按名字查询
+    上游不可用时返回最近一次成功获取的数据，数据年龄为距今的秒数；正常获取时为 None
+    """
+    def _fetch_player(self, player_name: str, platform: str):
+        key = (platform, player_name.lower())
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return self._format_player_stats(data, player_name, platform)
-            elif response.status_code == 404:
-                return True, tuple([False, f"未找到玩家：{player_name} (平台: {platform})", "apexlegends"])
-            elif response.status_code == 403:
-                return True, tuple([False, "API key 无效或未授权", "apexlegends"])
-            else:
-                return True, tuple([False, f"API 请求失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+            data = self._fetch_player_live(player_name, platform)
+        except Exception as e:
+            fallback = self._last_players.last(key) if self._is_outage(e) else None
+            if fallback is None:
+                raise
+            self._metrics.inc("apex_stale_fallback_total", {"endpoint": "bridge"})
+            data, stored_at = fallback
+            return data, time.time() - stored_at
+        self._last_players.set(key, data, 0)
+        return data, None
+
+    def _fetch_player_live(self, player_name: str, platform: str):
+        uid = self._known_uid(player_name, platform)
+        if uid:
+            try:
+                data = self._upstream_get("bridge", {"uid": uid, "platform": platform}, hedge=True)
+                self._record_player(data, platform)
+                return data
+            except ApexApiError as e:
+                if e.status_code != 404:
+                    raise
+                self._players.forget(player_name, platform)
+        self._check_missing(player_name, platform)
+        try:
+            data = self._upstream_get("bridge", {"player": player_name, "platform": platform}, hedge=True)
+        except ApexApiError as e:
+            if e.status_code == 404:
+                self._remember_missing(player_name, platform)
+            raise
+        self._record_player(data, platform)
+        return data
+
+    """
+    从本地查找玩家 UID：先查玩家索引，再查模糊索引中从排行榜等数据里见过的同名玩家（不区分大小写）
+    """
+    def _known_uid(self, player_name: str, platform: str):
+        uid = self._players.lookup(player_name, platform)
+        if not uid:
+            known = self._names.get(player_name, platform)
+            uid = known[1] if known else None
+        self._metrics.inc("apex_uid_index_total", {"result": "hit" if uid else "miss"})
+        return uid
+
+    """
+    玩家名最近返回过 404 时直接抛出 404，不再请求上游；之后又在其他数据中见到该玩家名时不拦截
+    """
+    def _check_missing(self, player_name: str, platform: str) -> None:
+        if self._missing_names.get((platform, player_name.lower())) is None:
+            return
+        if self._names.get(player_name, platform) is not None:
+            return
+        self._metrics.inc("apex_name_miss_total")
+        raise ApexApiError(404, {"player": player_name, "platform": platform})
+
+    def _remember_missing(self, player_name: str, platform: str) -> None:
+        if self.name_miss_ttl > 0:
+            self._missing_names.set((platform, player_name.lower()), True, self.name_miss_ttl)
+
+    """
+    判断错误是否属于上游故障（网络错误、5xx、熔断、限流），这类错误可以用旧数据兜底
+    """
+    def _is_outage(self, error: Exception) -> bool:
+        if isinstance(error, requests.exceptions.RequestException):
+            return True
+        return isinstance(error, ApexApiError) and error.status_code is not None and (
+            error.status_code >= 500 or error.status_code == 429
+        )
+
+    """
+    兜底数据的提示，说明数据是多久之前获取的
+    """
+    def _stale_note(self, age: float) -> str:
+        age = int(age)
+        if age < 60:
+            ago = f"{age} 秒"
+        elif age < 3600:
+            ago = f"{age // 60} 分钟"
+        else:
+            ago = f"{age // 3600} 小时"
+        return f"（Apex API 暂时不可用，以下为 {ago}前获取的数据）"
+
+    """
+    从 /bridge 返回的玩家数据更新本地索引，并保存一条数据快照
+    """
+    def _record_player(self, data, platform: str) -> None:
+        if not isinstance(data, dict):
+            return
+        global_stats = data.get("global", {})
+        name, platform, uid = global_stats.get("name"), global_stats.get("platform") or platform, global_stats.get("uid")
+        self._players.record(name, platform, uid)
+        self._names.add(name, platform, uid)
+        summary = self._player_summary(data)
+        self._snapshots.append(
+            summary["uid"], summary["level"], summary["rank_score"], summary["kills"], summary["damage"]
+        )
 
     """
     格式化玩家统计数据
@@ -160,324 +2465,891 @@ class ApexLegendsPlugin:
             global_stats = data.get("global", {})
             realtime = data.get("realtime", {})
             
-            result = f"【Apex Legends 玩家统计】\n"
-            result += f"玩家：{player_name} ({platform})\n"
-            result += f"UID：{data.get('global', {}).get('uid', 'N/A')}\n\n"
+            lines = [
+                "【Apex Legends 玩家统计】",
+                f"玩家：{player_name} ({platform})",
+                f"UID：{global_stats.get('uid', 'N/A')}",
+                "",
+            ]
             
             # 实时状态
             if realtime:
-                result += "【实时状态】\n"
-                result += f"在线：{'是' if realtime.get('isOnline', 0) == 1 else '否'}\n"
-                result += f"游戏中：{'是' if realtime.get('isInGame', 0) == 1 else '否'}\n"
+                lines.append("【实时状态】")
+                lines.append(f"在线：{'是' if realtime.get('isOnline', 0) == 1 else '否'}")
+                lines.append(f"游戏中：{'是' if realtime.get('isInGame', 0) == 1 else '否'}")
                 if realtime.get('currentStateAsText'):
-                    result += f"状态：{realtime.get('currentStateAsText')}\n"
-                result += "\n"
+                    lines.append(f"状态：{realtime.get('currentStateAsText')}")
+                lines.append("")
             
             # 等级
             if global_stats.get("level"):
-                result += f"等级：{global_stats.get('level')}\n"
+                lines.append(f"等级：{global_stats.get('level')}")
             
             # 排名
             if global_stats.get("rank"):
                 rank = global_stats.get("rank")
-                result += f"排位等级：{rank.get('rankName', 'N/A')} {rank.get('rankDiv', '')}\n"
-                result += f"排位分数：{rank.get('rankScore', 0)}\n"
+                lines.append(f"排位等级：{rank.get('rankName', 'N/A')} {rank.get('rankDiv', '')}")
+                lines.append(f"排位分数：{rank.get('rankScore', 0)}")
             
             # 总击杀数
             if global_stats.get("total"):
                 total = global_stats.get("total")
-                result += f"\n【总数据】\n"
-                result += f"总击杀：{total.get('kills', {}).get('value', 0)}\n"
-                result += f"总伤害：{total.get('damage', {}).get('value', 0)}\n"
-                result += f"总游戏数：{total.get('games_played', {}).get('value', 0)}\n"
+                lines.append("")
+                lines.append("【总数据】")
+                lines.append(f"总击杀：{total.get('kills', {}).get('value', 0)}")
+                lines.append(f"总伤害：{total.get('damage', {}).get('value', 0)}")
+                lines.append(f"总游戏数：{total.get('games_played', {}).get('value', 0)}")
             
             # 本赛季数据
             if global_stats.get("season"):
                 season = global_stats.get("season")
-                result += f"\n【本赛季数据】\n"
-                result += f"击杀：{season.get('kills', {}).get('value', 0)}\n"
-                result += f"伤害：{season.get('damage', {}).get('value', 0)}\n"
-                result += f"游戏数：{season.get('games_played', {}).get('value', 0)}\n"
+                lines.append("")
+                lines.append("【本赛季数据】")
+                lines.append(f"击杀：{season.get('kills', {}).get('value', 0)}")
+                lines.append(f"伤害：{season.get('damage', {}).get('value', 0)}")
+                lines.append(f"游戏数：{season.get('games_played', {}).get('value', 0)}")
             
-            return True, tuple([True, result, "apexlegends"])
+            return True, tuple([True, "\n".join(lines), "apexlegends"])
         except Exception as e:
             return True, tuple([False, f"数据解析失败：{str(e)}", "apexlegends"])
 
     """
-    名称转 UID
+    提取玩家数据中用于展示的字段
     """
-    def _name_to_uid(self, player_name: str, platform: str):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
-        
-        url = f"{self.api_base_url}/nametouid"
-        params = {
-            "auth": self.api_key,
-            "player": player_name,
-            "platform": platform
+    def _player_summary(self, data: dict) -> dict:
+        global_stats = data.get("global", {})
+        realtime = data.get("realtime", {})
+        rank = global_stats.get("rank") or {}
+        total = global_stats.get("total") or {}
+        return {
+            "name": global_stats.get("name"),
+            "uid": global_stats.get("uid"),
+            "level": global_stats.get("level"),
+            "rank_name": rank.get("rankName", "N/A"),
+            "rank_div": rank.get("rankDiv", ""),
+            "rank_score": rank.get("rankScore", 0),
+            "kills": total.get("kills", {}).get("value", 0),
+            "damage": total.get("damage", {}).get("value", 0),
+            "online": realtime.get("isOnline", 0) == 1,
+            "in_game": realtime.get("isInGame", 0) == 1,
         }
-        
+
+    """
+    批量查询玩家并以表格对比
+    先并发把玩家名解析为 UID，再用 /bridge 的多 UID 形式一次取回；上游不支持时对每个玩家并发查询
+    """
+    def _query_players(self, player_names: list, platform: str):
+        player_names = list(dict.fromkeys(player_names))
+        if len(player_names) > MAX_BATCH_PLAYERS:
+            return True, tuple([False, f"一次最多查询 {MAX_BATCH_PLAYERS} 名玩家", "apexlegends"])
+
+        uids = dict(zip(player_names, self._fanout.map(lambda name: self._lookup_uid(name, platform), player_names)))
+        players = self._fetch_players_by_uid([uid for uid in uids.values() if uid], platform)
+
+        lines = [f"【Apex Legends 玩家对比】({platform})", "玩家 | 等级 | 段位 | 分数 | 击杀 | 伤害 | 在线"]
+        for name in player_names:
+            data = players.get(uids[name])
+            if data is None:
+                lines.append(f"{name} | 未找到")
+                continue
+            summary = self._player_summary(data)
+            online = "游戏中" if summary["in_game"] else "是" if summary["online"] else "否"
+            lines.append(
+                f"{name} | {summary['level'] or 'N/A'} | {summary['rank_name']} {summary['rank_div']} | "
+                f"{summary['rank_score']} | {summary['kills']} | {summary['damage']} | {online}"
+            )
+        return True, tuple([True, "\n".join(lines), "apexlegends"])
+
+    """
+    把玩家名解析为 UID，玩家不存在时返回 None
+    """
+    def _lookup_uid(self, player_name: str, platform: str):
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                uid = data.get("uid", "N/A")
-                return True, tuple([True, f"玩家 {player_name} ({platform}) 的 UID：{uid}", "apexlegends"])
-            elif response.status_code == 404:
-                return True, tuple([False, f"未找到玩家：{player_name}", "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+            return self._resolve_uid(player_name, platform)
+        except ApexApiError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    """
+    把玩家名解析为 UID，优先使用本地索引，没有记录时请求 /nametouid 并写入索引
+    """
+    def _resolve_uid(self, player_name: str, platform: str):
+        uid = self._known_uid(player_name, platform)
+        if uid:
+            return uid
+        self._check_missing(player_name, platform)
+        params = {"player": player_name, "platform": platform}
+        try:
+            data = self._upstream_get("nametouid", params, SHARED_UID_TTL, hedge=True)
+        except ApexApiError as e:
+            if e.status_code == 404:
+                self._remember_missing(player_name, platform)
+            raise
+        uid = data.get("uid")
+        if not uid:
+            self._remember_missing(player_name, platform)
+            return None
+        self._players.record(data.get("name") or player_name, platform, uid)
+        self._names.add(data.get("name") or player_name, platform, uid)
+        return str(uid)
+
+    """
+    按 UID 批量获取玩家数据，返回 {uid: 玩家数据}
+    """
+    def _fetch_players_by_uid(self, uids: list, platform: str, priority: int = PRIORITY_INTERACTIVE,
+                              fan_out: bool = True) -> dict:
+        if not uids:
+            return {}
+        players = {}
+        try:
+            data = self._upstream_get("bridge", {"uid": ",".join(uids), "platform": platform}, priority=priority)
+            for player in data if isinstance(data, list) else [data]:
+                if isinstance(player, dict):
+                    players[str(player.get("global", {}).get("uid"))] = player
+                    self._record_player(player, platform)
+        except ApexApiError as e:
+            if e.status_code in (None, 403, 429):
+                raise
+
+        # 批量请求没有返回的玩家逐个并发查询（fan_out 为 False 时直接返回，不额外消耗配额）
+        if not fan_out:
+            return players
+        missing = [uid for uid in uids if uid not in players]
+        for uid, player in zip(missing, self._fanout.map(lambda uid: self._fetch_player_by_uid(uid, platform), missing)):
+            if player is not None:
+                players[uid] = player
+        return players
+
+    def _fetch_player_by_uid(self, uid: str, platform: str):
+        try:
+            data = self._upstream_get("bridge", {"uid": uid, "platform": platform})
+            self._record_player(data, platform)
+            return data
+        except ApexApiError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    """
+    名称转 UID
+    """
+    def _name_to_uid(self, player_name: str, platform: str):
+        uid = self._resolve_uid(player_name, platform) or "N/A"
+        return True, tuple([True, f"玩家 {player_name} ({platform}) 的 UID：{uid}", "apexlegends"])
 
     """
     查询匹配历史
     """
     def _query_matches(self, player_name: str, platform: str):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        data, age = self._fetch_player(player_name, platform)
+        recent_matches = data.get("recentMatches", [])
         
-        url = f"{self.api_base_url}/bridge"
-        params = {
-            "auth": self.api_key,
-            "player": player_name,
-            "platform": platform
-        }
+        if not recent_matches:
+            return True, tuple([True, f"玩家 {player_name} 暂无匹配历史", "apexlegends"])
         
+        lines = [self._stale_note(age), ""] if age is not None else []
+        lines += [f"【{player_name} 最近匹配记录】", ""]
+        for i, match in enumerate(recent_matches[:5], 1):  # 只显示最近5场
+            lines.append(f"第 {i} 场：")
+            lines.append(f"  模式：{match.get('gameMode', 'N/A')}")
+            lines.append(f"  击杀：{match.get('kills', 0)}")
+            lines.append(f"  伤害：{match.get('damage', 0)}")
+            lines.append(f"  排名：{match.get('rank', 'N/A')}")
+            lines.append("")
+        
+        return True, tuple([True, "\n".join(lines), "apexlegends"])
+
+    """
+    请求上游接口并返回解析后的数据
+    配置了共享缓存时先读取其他实例的结果；未命中时只有一个实例请求上游并写入共享缓存，其他实例等待读取
+    ttl 为共享缓存时间（秒），也可以是根据数据计算缓存时间的函数
+    """
+    def _upstream_get(self, endpoint: str, params: dict = None, ttl=SHARED_PLAYER_TTL,
+                      priority: int = PRIORITY_INTERACTIVE, hedge: bool = False):
+        def fetch():
+            return self._client.get(endpoint, params, priority=priority, hedge=hedge)
+
+        shared = self._shared if self.shared_cache_path else None
+        if shared is None:
+            return fetch()
+        key = json.dumps([endpoint, sorted((params or {}).items())])
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                recent_matches = data.get("recentMatches", [])
-                
-                if not recent_matches:
-                    return True, tuple([True, f"玩家 {player_name} 暂无匹配历史", "apexlegends"])
-                
-                result = f"【{player_name} 最近匹配记录】\n\n"
-                for i, match in enumerate(recent_matches[:5], 1):  # 只显示最近5场
-                    result += f"第 {i} 场：\n"
-                    result += f"  模式：{match.get('gameMode', 'N/A')}\n"
-                    result += f"  击杀：{match.get('kills', 0)}\n"
-                    result += f"  伤害：{match.get('damage', 0)}\n"
-                    result += f"  排名：{match.get('rank', 'N/A')}\n"
-                    result += "\n"
-                
-                return True, tuple([True, result, "apexlegends"])
+            data, hit = shared.get_or_fetch(key, fetch, ttl)
+        except sqlite3.Error as e:
+            print(f"Apex Legends 插件：读取共享缓存失败：{str(e)}")
+            return fetch()
+        self._metrics.inc("apex_shared_cache_total", {"endpoint": endpoint, "result": "hit" if hit else "miss"})
+        return data
+
+    """
+    根据本地快照计算玩家的数据变化趋势，不请求上游玩家数据
+    """
+    def _query_trend(self, player_name: str, platform: str):
+        # 没有本地记录的玩家也不会有快照，不请求 /nametouid
+        uid = self._known_uid(player_name, platform)
+        rows = self._snapshots.history(uid) if uid else []
+        if len(rows) < 2:
+            return True, tuple([True, f"玩家 {player_name} 的历史数据不足，多次使用 apex player 查询后再试", "apexlegends"])
+
+        def fmt_time(ts):
+            return datetime.fromtimestamp(ts).strftime("%m-%d %H:%M")
+
+        def delta(new, old):
+            if new is None or old is None:
+                return "N/A"
+            return f"{new - old:+d}"
+
+        first, last = rows[0], rows[-1]
+        lines = [
+            f"【{player_name} 数据趋势】",
+            f"记录区间：{fmt_time(first[0])} ~ {fmt_time(last[0])}（{len(rows)} 条快照）",
+            f"等级：{last[1]}（{delta(last[1], first[1])}）",
+            f"排位分数：{last[2]}（{delta(last[2], first[2])}）",
+            f"击杀：{last[3]}（{delta(last[3], first[3])}）",
+            f"伤害：{last[4]}（{delta(last[4], first[4])}）",
+        ]
+
+        # 相邻快照间隔超过 TREND_SESSION_GAP 视为新的时段，时段收益为该时段最后一条快照与上一时段结束时的差值
+        sessions = [[rows[0]]]
+        for row in rows[1:]:
+            if row[0] - sessions[-1][-1][0] > TREND_SESSION_GAP:
+                sessions.append([row])
             else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+                sessions[-1].append(row)
+        lines += ["", "【各时段变化】"]
+        for i in range(max(0, len(sessions) - TREND_MAX_SESSIONS), len(sessions)):
+            session = sessions[i]
+            start = sessions[i - 1][-1] if i > 0 else session[0]
+            end = session[-1]
+            lines.append(
+                f"{fmt_time(session[0][0])}：排位分数 {delta(end[2], start[2])}，"
+                f"击杀 {delta(end[3], start[3])}，伤害 {delta(end[4], start[4])}"
+            )
+
+        # 排位分数变化记录
+        rp_history = [rows[0]]
+        for row in rows[1:]:
+            if row[2] != rp_history[-1][2]:
+                rp_history.append(row)
+        lines += ["", "【排位分数记录】"]
+        for row in rp_history[-10:]:
+            lines.append(f"{fmt_time(row[0])}：{row[2]}")
+        return True, tuple([True, "\n".join(lines), "apexlegends"])
+
+    """
+    关注玩家。关注的目标是当前群，私聊时为当前用户
+    """
+    def _watch_player(self, ame: AstrMessageEvent, player_name: str, platform: str):
+        target = self._watch_target(*self._message_source(ame))
+        if target is None:
+            return True, tuple([False, "无法识别消息来源，不能关注玩家", "apexlegends"])
+        if self._watch_budget is None:
+            return True, tuple([False, "关注功能未开启", "apexlegends"])
+        if len(self._watchlist.watched_by(target)) >= WATCH_MAX_PER_TARGET:
+            return True, tuple([False, f"每个群最多关注 {WATCH_MAX_PER_TARGET} 名玩家", "apexlegends"])
+        uid = self._resolve_uid(player_name, platform)
+        if not uid:
+            return True, tuple([False, f"未找到玩家：{player_name} (平台: {platform})", "apexlegends"])
+        if not self._watchlist.add(target, platform, uid, player_name):
+            return True, tuple([True, f"已经关注了 {player_name} ({platform})", "apexlegends"])
+        return True, tuple([True, f"已关注 {player_name} ({platform})，段位、分数、等级和在线状态变化时会通知", "apexlegends"])
+
+    """
+    取消关注玩家
+    """
+    def _unwatch_player(self, ame: AstrMessageEvent, player_name: str, platform: str):
+        target = self._watch_target(*self._message_source(ame))
+        if target is None:
+            return True, tuple([False, "无法识别消息来源", "apexlegends"])
+        uid = next((uid for watched_platform, uid, name in self._watchlist.watched_by(target)
+                    if watched_platform == platform and name.lower() == player_name.lower()), None)
+        uid = uid or self._players.lookup(player_name, platform)
+        if not uid or not self._watchlist.remove(target, platform, uid):
+            return True, tuple([False, f"没有关注 {player_name} ({platform})", "apexlegends"])
+        return True, tuple([True, f"已取消关注 {player_name} ({platform})", "apexlegends"])
+
+    """
+    显示当前群关注的玩家和最后一次轮询到的状态
+    """
+    def _show_watchlist(self, ame: AstrMessageEvent):
+        target = self._watch_target(*self._message_source(ame))
+        watched = self._watchlist.watched_by(target) if target else []
+        if not watched:
+            return True, tuple([True, "还没有关注任何玩家，使用 apex watch <玩家名> <平台> 关注", "apexlegends"])
+        lines = ["【关注列表】"]
+        for platform, uid, name in watched:
+            state = self._watchlist.state(platform, uid)
+            if state is None:
+                lines.append(f"{name} ({platform})：等待首次更新")
+                continue
+            online = "游戏中" if state["in_game"] else "在线" if state["online"] else "离线"
+            lines.append(f"{name} ({platform})：{online}，{state['rank_name']} {state['rank_div']}，"
+                         f"{state['rank_score']} 分，等级 {state['level']}")
+        return True, tuple([True, "\n".join(lines), "apexlegends"])
+
+    """
+    关注动态的目标：群消息为该群，私聊为该用户，无法识别时为 None
+    """
+    def _watch_target(self, group, user):
+        if group:
+            return f"group:{group}"
+        if user:
+            return f"user:{user}"
+        return None
+
+    """
+    把排队中的关注动态附加到回复末尾
+    """
+    def _attach_notifications(self, reply, target):
+        if target is None or reply[1] is None or not isinstance(reply[1][1], str):
+            return reply
+        with self._pending_lock:
+            pending = self._pending.pop(target, None)
+        if not pending:
+            return reply
+        succeeded, text, name = reply[1]
+        return reply[0], tuple([succeeded, text + "\n\n【关注动态】\n" + "\n".join(pending), name])
+
+    """
+    轮询关注列表中到期的玩家：按平台分组，每次 /bridge 批量查询 MAX_BATCH_PLAYERS 名玩家
+    使用后台优先级，并且只使用 APEX_WATCH_REQUESTS_PER_MIN 的固定配额，配额用完的玩家留到下一轮
+    """
+    def _poll_watchlist(self) -> float:
+        batches = {}
+        for platform, uid in self._watchlist.due():
+            batches.setdefault(platform, []).append(uid)
+        for platform, uids in batches.items():
+            for i in range(0, len(uids), MAX_BATCH_PLAYERS):
+                if not self._watch_budget.acquire(PRIORITY_BACKGROUND, 0):
+                    return time.time() + WATCH_TICK_SECS
+                batch = uids[i:i + MAX_BATCH_PLAYERS]
+                try:
+                    players = self._fetch_players_by_uid(batch, platform, PRIORITY_BACKGROUND, fan_out=False)
+                except Exception as e:
+                    print(f"Apex Legends 插件：轮询关注列表失败：{str(e)}")
+                    players = {}
+                for uid in batch:
+                    data = players.get(uid)
+                    if data is None:
+                        self._watchlist.postpone(platform, uid)
+                    else:
+                        self._update_watched(platform, uid, data)
+        return time.time() + WATCH_TICK_SECS
+
+    """
+    保存关注玩家的新状态，和上一次相比有变化时通知关注者
+    """
+    def _update_watched(self, platform: str, uid: str, data: dict) -> None:
+        summary = self._player_summary(data)
+        state = {key: summary[key] for key in ("rank_name", "rank_div", "rank_score", "level", "online", "in_game")}
+        previous = self._watchlist.state(platform, uid)
+        self._watchlist.update(platform, uid, summary["name"], state, state["online"] or state["in_game"])
+        changes = self._watch_changes(previous, state) if previous else []
+        if not changes:
+            return
+        text = f"{summary['name'] or uid} ({platform})：" + "，".join(changes)
+        for target in self._watchlist.targets(platform, uid):
+            self._notify(target, text)
+
+    """
+    比较两次状态，返回变化的描述列表
+    """
+    def _watch_changes(self, previous: dict, state: dict) -> list:
+        changes = []
+        if state["in_game"] and not previous.get("in_game"):
+            changes.append("开始游戏" if previous.get("online") else "上线并开始游戏")
+        elif state["online"] and not previous.get("online"):
+            changes.append("上线了")
+        elif not state["online"] and previous.get("online"):
+            changes.append("下线了")
+        rank = f"{state['rank_name']} {state['rank_div']}".strip()
+        previous_rank = f"{previous.get('rank_name')} {previous.get('rank_div')}".strip()
+        if rank != previous_rank:
+            changes.append(f"段位 {previous_rank} → {rank}")
+        if state["rank_score"] != previous.get("rank_score"):
+            diff = (state["rank_score"] or 0) - (previous.get("rank_score") or 0)
+            changes.append(f"排位分数 {previous.get('rank_score')} → {state['rank_score']}（{diff:+}）")
+        if state["level"] != previous.get("level"):
+            changes.append(f"等级 {previous.get('level')} → {state['level']}")
+        return changes
+
+    """
+    推送一条关注动态。设置了 notifier 时直接发送，没有设置或发送失败时排队
+    """
+    def _notify(self, target: str, text: str) -> None:
+        if self._notifier is not None:
+            kind, _, target_id = target.partition(":")
+            try:
+                if self._notifier(kind, target_id, text):
+                    return
+            except Exception as e:
+                print(f"Apex Legends 插件：推送关注动态失败：{str(e)}")
+        with self._pending_lock:
+            self._pending.setdefault(target, deque(maxlen=WATCH_PENDING_MAX)).append(text)
+
+    """
+    获取全局数据（地图轮换、商店等），优先使用缓存。返回 (数据, 数据摘要, 数据年龄)
+    缓存过期但仍在 stale 窗口内时直接返回旧数据，同时在后台刷新
+    上游不可用时返回最近一次获取的数据，数据年龄为距今的秒数；其余情况为 None
+    """
+    def _fetch_global(self, endpoint: str):
+        cached = self._cache.get(endpoint)
+        if cached is not None:
+            entry, fresh = cached
+            self._metrics.inc("apex_cache_requests_total", {"endpoint": endpoint, "result": "hit" if fresh else "stale"})
+            if not fresh:
+                self._refresh_in_background(endpoint)
+            return entry + (None,)
+        self._metrics.inc("apex_cache_requests_total", {"endpoint": endpoint, "result": "miss"})
+        try:
+            return self._refresh_global(endpoint) + (None,)
+        except Exception as e:
+            fallback = self._cache.last(endpoint) if self._is_outage(e) else None
+            if fallback is None:
+                raise
+            self._metrics.inc("apex_stale_fallback_total", {"endpoint": endpoint})
+            (data, digest), stored_at = fallback
+            return data, digest, time.time() - stored_at
+
+    """
+    从上游拉取全局数据并写入缓存，同时计算数据摘要，用于判断内容是否变化
+    """
+    def _refresh_global(self, endpoint: str, priority: int = PRIORITY_INTERACTIVE):
+        data = self._upstream_get(endpoint, ttl=lambda data: self._global_ttl(endpoint, data), priority=priority)
+        if endpoint in ("leaderboard", "predator"):
+            self._index_ranked_names(data)
+        digest = hashlib.blake2b(json.dumps(data, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+        self._cache.set(endpoint, (data, digest), self._global_ttl(endpoint, data), GLOBAL_CACHE_STALE)
+        return data, digest
+
+    """
+    把排行榜（/leaderboard、/predator）中的玩家名加入模糊索引
+    """
+    def _index_ranked_names(self, data) -> None:
+        if not isinstance(data, dict):
+            return
+        for platform in PLATFORMS:
+            for entry in data.get(platform) or []:
+                if isinstance(entry, dict):
+                    self._names.add(entry.get("name"), platform, entry.get("uid"))
+
+    """
+    渲染全局指令的回复。同一份数据（按摘要区分）只渲染一次，之后直接返回缓存的文本
+    CLOCK_RENDERERS 中的渲染函数按秒区分，剩余时间等随时间变化的内容不会被缓存住
+    """
+    def _render_global(self, endpoint: str, render):
+        data, digest, age = self._fetch_global(endpoint)
+        key = (render.__name__, digest, int(time.time()) if render.__name__ in CLOCK_RENDERERS else None)
+        text = self._rendered.get(key)
+        self._metrics.inc("apex_render_cache_total", {"result": "miss" if text is None else "hit"})
+        if text is None:
+            started = time.perf_counter()
+            text = render(data)
+            self._metrics.observe("apex_render_seconds", {"renderer": render.__name__}, time.perf_counter() - started)
+            if len(self._rendered) >= RENDER_CACHE_SIZE:
+                self._rendered.clear()
+            self._rendered[key] = text
+        if age is not None:
+            text = self._stale_note(age) + "\n\n" + text
+        return True, tuple([True, text, "apexlegends"])
+
+    """
+    在后台线程中刷新全局数据，同一接口同时只会有一个刷新任务
+    """
+    def _refresh_in_background(self, endpoint: str):
+        with self._refreshing_lock:
+            if endpoint in self._refreshing:
+                return
+            self._refreshing.add(endpoint)
+
+        def worker():
+            try:
+                self._refresh_global(endpoint, PRIORITY_BACKGROUND)
+            except Exception as e:
+                print(f"Apex Legends 插件：后台刷新 {endpoint} 失败：{str(e)}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(endpoint)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    """
+    后台任务的回调，metrics 为导出统计指标，snapshot 为保存缓存快照，watch 为轮询关注列表，其余为预取全局数据
+    """
+    def _run_scheduled(self, key: str) -> float:
+        if key == "metrics":
+            self._export_metrics()
+            return time.time() + METRICS_EXPORT_INTERVAL
+        if key == "snapshot":
+            self._save_caches()
+            return time.time() + CACHE_SNAPSHOT_INTERVAL
+        if key == "watch":
+            return self._poll_watchlist()
+        return self._prefetch(key)
+
+    """
+    把统计指标以 Prometheus 文本格式写入 APEX_METRICS_FILE（先写临时文件再替换，读取方不会读到半个文件）
+    """
+    def _export_metrics(self) -> None:
+        tmp_path = f"{self.metrics_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self._metrics.render_prometheus())
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            print(f"Apex Legends 插件：导出统计指标失败：{str(e)}")
+
+    """
+    显示插件的运行统计（仅管理员）
+    """
+    def _show_stats(self):
+        def fmt_secs(value):
+            if value is None:
+                return "N/A"
+            if value == float("inf"):
+                return f"> {LATENCY_BUCKETS[-1]}s"
+            return f"≤ {value * 1000:g}ms"
+
+        def ratio(hit, total):
+            return f"{hit / total * 100:.1f}%" if total else "N/A"
+
+        lines = ["【Apex 插件统计】", f"运行时间：{int(time.time() - self._started_at)} 秒", "", "【上游请求】"]
+        statuses = self._metrics.counters("apex_upstream_responses_total")
+        traffic = self._metrics.counters("apex_upstream_bytes_total")
+        waits = self._metrics.histograms("apex_queue_wait_seconds")
+        for labels, (count, _, p50, p95) in sorted(self._metrics.histograms("apex_upstream_seconds").items()):
+            endpoint = dict(labels)["endpoint"]
+            errors = sum(value for key, value in statuses.items()
+                         if dict(key)["endpoint"] == endpoint and dict(key)["status"] != "200")
+            wait = waits.get(labels)
+            avg_wait = wait[1] / wait[0] * 1000 if wait and wait[0] else 0
+            lines.append(
+                f"{endpoint}：{count} 次，p50 {fmt_secs(p50)}，p95 {fmt_secs(p95)}，非 200 {int(errors)} 次，"
+                f"流量 {traffic.get(labels, 0) / 1024:.1f} KB，平均排队 {avg_wait:.1f}ms"
+            )
+
+        states = {endpoint: state for endpoint, state in self._client.breaker_states().items() if state != "closed"}
+        lines.append("熔断：" + ("，".join(f"{endpoint} {state}" for endpoint, state in sorted(states.items())) or "无"))
+        hedged = sum(self._metrics.counters("apex_hedged_requests_total").values())
+        hedge_wins = sum(self._metrics.counters("apex_hedge_wins_total").values())
+        fallbacks = sum(self._metrics.counters("apex_stale_fallback_total").values())
+        lines.append(f"对冲请求：{int(hedged)} 次（对冲先返回 {int(hedge_wins)} 次），故障时返回旧数据：{int(fallbacks)} 次")
+
+        if len(self._client.keys) > 1:
+            lines.append("API key：" + "，".join(
+                f"#{index} {state} {count} 次" for index, state, count in self._client.keys.states()
+            ))
+
+        lines += ["", "【缓存】"]
+        cache = self._metrics.counters("apex_cache_requests_total")
+        hits = sum(value for key, value in cache.items() if dict(key)["result"] == "hit")
+        stale = sum(value for key, value in cache.items() if dict(key)["result"] == "stale")
+        misses = sum(value for key, value in cache.items() if dict(key)["result"] == "miss")
+        lines.append(f"全局数据：命中率 {ratio(hits + stale, hits + stale + misses)}"
+                     f"（命中 {int(hits)}，过期仍返回 {int(stale)}，未命中 {int(misses)}）")
+        if self.shared_cache_path:
+            shared = self._metrics.counters("apex_shared_cache_total")
+            shared_hits = sum(value for key, value in shared.items() if dict(key)["result"] == "hit")
+            lines.append(f"共享缓存：命中率 {ratio(shared_hits, sum(shared.values()))}（其他实例请求的数据）")
+        render_hits = self._metrics.counter("apex_render_cache_total", {"result": "hit"})
+        render_misses = self._metrics.counter("apex_render_cache_total", {"result": "miss"})
+        lines.append(f"渲染结果：命中率 {ratio(render_hits, render_hits + render_misses)}")
+        index_hits = self._metrics.counter("apex_uid_index_total", {"result": "hit"})
+        index_misses = self._metrics.counter("apex_uid_index_total", {"result": "miss"})
+        lines.append(f"玩家索引：命中率 {ratio(index_hits, index_hits + index_misses)}")
+        if self._name_index is not None:
+            blocked = self._metrics.counter("apex_name_miss_total")
+            lines.append(f"玩家名索引：{len(self._name_index)} 个名字，重复查询不存在的玩家拦截 {int(blocked)} 次")
+
+        duplicates = self._metrics.counter("apex_flood_total", {"result": "duplicate"})
+        throttled = self._metrics.counter("apex_flood_total", {"result": "throttled"})
+        lines.append(f"防刷屏：重复指令直接回复 {int(duplicates)} 次，超出用户配额 {int(throttled)} 次")
+
+        if self._watch_store is not None:
+            with self._pending_lock:
+                pending = sum(len(queue) for queue in self._pending.values())
+            lines.append(f"关注列表：{len(self._watch_store)} 名玩家，待发送动态 {pending} 条")
+
+        lines += ["", "【指令】"]
+        for labels, (count, _, p50, p95) in sorted(self._metrics.histograms("apex_command_seconds").items()):
+            lines.append(f"{dict(labels)['command']}：{count} 次，p50 {fmt_secs(p50)}，p95 {fmt_secs(p95)}")
+        return True, tuple([True, "\n".join(lines), "apexlegends"])
+
+    """
+    预取调度器的回调：刷新全局数据并返回下一次刷新时间
+    轮换类数据在轮换结束后立即刷新，其余数据按缓存时间周期刷新，两者都带随机抖动
+    """
+    def _prefetch(self, endpoint: str) -> float:
+        data, _ = self._refresh_global(endpoint, PRIORITY_BACKGROUND)
+        ttl = self._global_ttl(endpoint, data)
+        if endpoint in PREFETCH_ROTATING:
+            return time.time() + ttl + random.uniform(0, PREFETCH_JITTER_SECS)
+        return time.time() + ttl * random.uniform(1 - PREFETCH_JITTER_RATIO, 1 + PREFETCH_JITTER_RATIO)
+
+    """
+    计算全局数据的缓存时间。地图轮换、制造轮换和商店以数据中的结束时间为准，其余使用默认值
+    """
+    def _global_ttl(self, endpoint: str, data) -> float:
+        default_ttl = GLOBAL_CACHE_TTL.get(endpoint, 60)
+        if endpoint == "maprotation":
+            ends = self._rotation_ends(data)
+        elif endpoint == "crafting":
+            ends = self._crafting_ends(data)
+        elif endpoint == "store":
+            ends = self._store_ends(data)
+        else:
+            return default_ttl
+        now = time.time()
+        upcoming = [end for end in ends if end > now]
+        if not upcoming:
+            return default_ttl
+        return min(upcoming) - now + ROTATION_GRACE_SECS
+
+    """
+    从地图轮换数据中取出各模式当前地图的结束时间（unix 时间戳）
+    """
+    def _rotation_ends(self, data) -> list:
+        ends = []
+        if not isinstance(data, dict):
+            return ends
+        now = time.time()
+        for mode in data.values():
+            if not isinstance(mode, dict) or not isinstance(mode.get("current"), dict):
+                continue
+            current = mode["current"]
+            if isinstance(current.get("end"), (int, float)):
+                ends.append(current["end"])
+            elif isinstance(current.get("remainingSecs"), (int, float)):
+                ends.append(now + current["remainingSecs"])
+        return ends
+
+    """
+    从制造轮换数据中取出各物品的结束时间（unix 时间戳）
+    """
+    def _crafting_ends(self, data) -> list:
+        ends = []
+        if not isinstance(data, list):
+            return ends
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            if isinstance(item.get("end"), (int, float)):
+                ends.append(item["end"])
+                continue
+            end_date = item.get("endDate")
+            if isinstance(end_date, dict):
+                end_date = end_date.get("date")
+            if not isinstance(end_date, str):
+                continue
+            try:
+                end = datetime.fromisoformat(end_date)
+            except ValueError:
+                continue
+            # 上游返回的日期不带时区，表示 UTC
+            if end.tzinfo is None:
+                end = end.replace(tzinfo=timezone.utc)
+            ends.append(end.timestamp())
+        return ends
+
+    """
+    从商店数据中取出各商品的下架时间（unix 时间戳）
+    """
+    def _store_ends(self, data) -> list:
+        items = data if isinstance(data, list) else data.get("bundleContent", []) if isinstance(data, dict) else []
+        ends = []
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("expireTimestamp"), (int, float)):
+                ends.append(item["expireTimestamp"])
+        return ends
+
+    """
+    获取全局排行榜数据的排序索引，数据没有变化时复用已建立的索引
+    """
+    def _rank_index(self, endpoint: str) -> RankSnapshot:
+        data, digest, _ = self._fetch_global(endpoint)
+        source, index = self._rank_indexes.get(endpoint, (None, None))
+        if source != digest:
+            index = RankSnapshot(data)
+            self._rank_indexes[endpoint] = (digest, index)
+        return index
+
+    """
+    查询排位分数在缓存排行榜中的位置以及与猎杀者门槛的差距
+    """
+    def _query_rank_position(self, score: int, platform: str):
+        leaderboard = self._rank_index("leaderboard")
+        predator = self._rank_index("predator")
+
+        lines = [f"【排位分数定位】({platform})", f"分数：{score}"]
+        position = leaderboard.position(platform, score)
+        if position is None:
+            lines.append("排行榜：暂无该平台数据")
+        elif position[0] > position[1]:
+            lines.append(f"排行榜：未进入榜单（榜单最低 {leaderboard.lowest(platform)} 分）")
+        else:
+            lines.append(f"排行榜：第 {position[0]} 名（共 {position[1]} 名）")
+
+        threshold = predator.threshold(platform)
+        if threshold is None:
+            lines.append("猎杀者门槛：暂无该平台数据")
+        elif score >= threshold:
+            lines.append(f"猎杀者门槛：{threshold} 分，已达到")
+        else:
+            lines.append(f"猎杀者门槛：{threshold} 分，还差 {threshold - score} 分")
+        return True, tuple([True, "\n".join(lines), "apexlegends"])
 
     """
     查询排行榜
     """
     def _query_leaderboard(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("leaderboard", self._render_leaderboard)
+
+    def _render_leaderboard(self, data) -> str:
+        lines = ["【Apex Legends 排行榜】", ""]
         
-        url = f"{self.api_base_url}/leaderboard"
-        params = {"auth": self.api_key}
+        # 显示各个平台的排行榜
+        for platform in PLATFORMS:
+            if platform in data:
+                lines.append(f"【{platform} 平台】")
+                for i, entry in enumerate(data[platform][:5], 1):  # 只显示前5名
+                    lines.append(f"{i}. {entry.get('name', 'N/A')} - {entry.get('rank', {}).get('rankScore', 0)} 分")
+                lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 排行榜】\n\n"
-                
-                # 显示各个平台的排行榜
-                for platform in ["PC", "PS4", "X1"]:
-                    if platform in data:
-                        platform_data = data[platform]
-                        result += f"【{platform} 平台】\n"
-                        for i, entry in enumerate(platform_data[:5], 1):  # 只显示前5名
-                            result += f"{i}. {entry.get('name', 'N/A')} - {entry.get('rank', {}).get('rankScore', 0)} 分\n"
-                        result += "\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        return "\n".join(lines)
 
     """
     查询地图轮换
     """
     def _query_map_rotation(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("maprotation", self._render_map_rotation)
+
+    def _render_map_rotation(self, data) -> str:
+        lines = ["【Apex Legends 地图轮换】", ""]
         
-        url = f"{self.api_base_url}/maprotation"
-        params = {"auth": self.api_key}
+        # 大逃杀地图
+        if "battle_royale" in data:
+            current, upcoming, remaining = self._rotation_now(data["battle_royale"])
+            lines.append("【大逃杀模式】")
+            lines.append(f"当前地图：{current.get('map', 'N/A')}")
+            lines.append(f"剩余时间：{remaining}")
+            lines.append(f"下一张地图：{upcoming.get('map', 'N/A')}")
+            lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 地图轮换】\n\n"
-                
-                # 大逃杀地图
-                if "battle_royale" in data:
-                    br = data["battle_royale"]
-                    result += "【大逃杀模式】\n"
-                    result += f"当前地图：{br.get('current', {}).get('map', 'N/A')}\n"
-                    result += f"剩余时间：{br.get('current', {}).get('remainingTimer', 'N/A')}\n"
-                    result += f"下一张地图：{br.get('next', {}).get('map', 'N/A')}\n\n"
-                
-                # 竞技场地图
-                if "arenas" in data:
-                    arenas = data["arenas"]
-                    result += "【竞技场模式】\n"
-                    result += f"当前地图：{arenas.get('current', {}).get('map', 'N/A')}\n"
-                    result += f"剩余时间：{arenas.get('current', {}).get('remainingTimer', 'N/A')}\n"
-                    result += f"下一张地图：{arenas.get('next', {}).get('map', 'N/A')}\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        # 竞技场地图
+        if "arenas" in data:
+            current, upcoming, remaining = self._rotation_now(data["arenas"])
+            lines.append("【竞技场模式】")
+            lines.append(f"当前地图：{current.get('map', 'N/A')}")
+            lines.append(f"剩余时间：{remaining}")
+            lines.append(f"下一张地图：{upcoming.get('map', 'N/A')}")
+        
+        return "\n".join(lines)
+
+    """
+    按当前时间确定一个模式的 (当前地图, 下一张地图, 剩余时间)
+    缓存的数据在整个轮换期间有效，剩余时间由 end 现算；数据过期后当前地图已轮换时，上一次的下一张地图即为当前地图
+    """
+    def _rotation_now(self, mode: dict):
+        current, upcoming = mode.get("current") or {}, mode.get("next") or {}
+        now = time.time()
+        if isinstance(current.get("end"), (int, float)) and current["end"] <= now and upcoming:
+            current, upcoming = upcoming, {}
+        end = current.get("end")
+        if not isinstance(end, (int, float)):
+            return current, upcoming, current.get("remainingTimer", "N/A")
+        remaining = max(0, int(end - now))
+        return current, upcoming, f"{remaining // 3600:02d}:{remaining % 3600 // 60:02d}:{remaining % 60:02d}"
 
     """
     查询商店
     """
     def _query_store(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("store", self._render_store)
+
+    def _render_store(self, data) -> str:
+        lines = ["【Apex Legends 商店】", ""]
         
-        url = f"{self.api_base_url}/store"
-        params = {"auth": self.api_key}
+        # 显示商店物品
+        for i, item in enumerate(data.get("bundleContent", [])[:10], 1):
+            lines.append(f"{i}. {item.get('item', {}).get('name', 'N/A')}")
+            lines.append(f"   价格：{item.get('cost', {}).get('amount', 0)} {item.get('cost', {}).get('currency', '')}")
+            lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 商店】\n\n"
-                
-                # 显示商店物品
-                for i, item in enumerate(data.get("bundleContent", [])[:10], 1):
-                    result += f"{i}. {item.get('item', {}).get('name', 'N/A')}\n"
-                    result += f"   价格：{item.get('cost', {}).get('amount', 0)} {item.get('cost', {}).get('currency', '')}\n\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        return "\n".join(lines)
 
     """
     查询制造轮换
     """
     def _query_crafting(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("crafting", self._render_crafting)
+
+    def _render_crafting(self, data) -> str:
+        lines = ["【Apex Legends 制造轮换】", ""]
         
-        url = f"{self.api_base_url}/crafting"
-        params = {"auth": self.api_key}
+        # 显示制造物品
+        for i, item in enumerate(data[:10], 1):
+            lines.append(f"{i}. {item.get('itemType', {}).get('name', 'N/A')}")
+            lines.append(f"   成本：{item.get('cost', 0)} 材料")
+            lines.append(f"   结束时间：{item.get('endDate', {}).get('date', 'N/A')}")
+            lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 制造轮换】\n\n"
-                
-                # 显示制造物品
-                for i, item in enumerate(data[:10], 1):
-                    result += f"{i}. {item.get('itemType', {}).get('name', 'N/A')}\n"
-                    result += f"   成本：{item.get('cost', 0)} 材料\n"
-                    result += f"   结束时间：{item.get('endDate', {}).get('date', 'N/A')}\n\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        return "\n".join(lines)
 
     """
     查询新闻
     """
     def _query_news(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("news", self._render_news)
+
+    def _render_news(self, data) -> str:
+        lines = ["【Apex Legends 新闻】", ""]
         
-        url = f"{self.api_base_url}/news"
-        params = {"auth": self.api_key}
+        # 显示新闻
+        for i, news in enumerate(data[:5], 1):
+            lines.append(f"{i}. {news.get('title', 'N/A')}")
+            lines.append(f"   {news.get('short_desc', '')}")
+            lines.append(f"   链接：{news.get('link', 'N/A')}")
+            lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 新闻】\n\n"
-                
-                # 显示新闻
-                for i, news in enumerate(data[:5], 1):
-                    result += f"{i}. {news.get('title', 'N/A')}\n"
-                    result += f"   {news.get('short_desc', '')}\n"
-                    result += f"   链接：{news.get('link', 'N/A')}\n\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        return "\n".join(lines)
 
     """
     查询服务器状态
     """
     def _query_server_status(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("servers", self._render_server_status)
+
+    def _render_server_status(self, data) -> str:
+        lines = ["【Apex Legends 服务器状态】", ""]
         
-        url = f"{self.api_base_url}/servers"
-        params = {"auth": self.api_key}
+        # 显示服务器状态
+        for server in data:
+            lines.append(f"【{server.get('Server', 'N/A')}】")
+            lines.append(f"状态：{server.get('Status', 'N/A')}")
+            lines.append(f"响应时间：{server.get('ResponseTime', 'N/A')}")
+            lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 服务器状态】\n\n"
-                
-                # 显示服务器状态
-                for server in data:
-                    result += f"【{server.get('Server', 'N/A')}】\n"
-                    result += f"状态：{server.get('Status', 'N/A')}\n"
-                    result += f"响应时间：{server.get('ResponseTime', 'N/A')}\n\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        return "\n".join(lines)
 
     """
     查询猎杀者排行榜
     """
     def _query_predator(self):
-        if not self.api_key:
-            return True, tuple([False, "未配置 API key，请在插件配置中添加", "apexlegends"])
+        return self._render_global("predator", self._render_predator)
+
+    def _render_predator(self, data) -> str:
+        lines = ["【Apex Legends 猎杀者排行榜】", ""]
         
-        url = f"{self.api_base_url}/predator"
-        params = {"auth": self.api_key}
+        # 显示各平台猎杀者
+        for platform in PLATFORMS:
+            if platform in data:
+                lines.append(f"【{platform} 平台】")
+                for i, entry in enumerate(data[platform][:5], 1):
+                    lines.append(f"{i}. {entry.get('name', 'N/A')} - {entry.get('rank', {}).get('rankScore', 0)} 分")
+                lines.append("")
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                result = "【Apex Legends 猎杀者排行榜】\n\n"
-                
-                # 显示各平台猎杀者
-                for platform in ["PC", "PS4", "X1"]:
-                    if platform in data:
-                        platform_data = data[platform]
-                        result += f"【{platform} 平台】\n"
-                        for i, entry in enumerate(platform_data[:5], 1):
-                            result += f"{i}. {entry.get('name', 'N/A')} - {entry.get('rank', {}).get('rankScore', 0)} 分\n"
-                        result += "\n"
-                
-                return True, tuple([True, result, "apexlegends"])
-            else:
-                return True, tuple([False, f"查询失败：{response.status_code}", "apexlegends"])
-        except requests.exceptions.RequestException as e:
-            return True, tuple([False, f"网络请求失败：{str(e)}", "apexlegends"])
+        return "\n".join(lines)
 
     """
     插件元信息。
@@ -501,8 +3373,10 @@ class ApexLegendsPlugin:
 可用指令：
 • apex help - 显示帮助信息
 • apex player <玩家名> <平台> - 查询玩家统计信息
+• apex players <玩家名1,玩家名2,...> <平台> - 批量查询并对比玩家
 • apex uid <玩家名> <平台> - 查询玩家 UID
 • apex matches <玩家名> <平台> - 查询匹配历史
+• apex trend <玩家名> <平台> - 查询玩家数据趋势（基于本地记录）
 • apex leaderboard - 查询排行榜
 • apex map - 查询地图轮换
 • apex store - 查询商店
@@ -510,6 +3384,11 @@ class ApexLegendsPlugin:
 • apex news - 查询新闻
 • apex status - 查询服务器状态
 • apex predator - 查询猎杀者排行榜
+• apex rank <排位分数> <平台> - 查询分数对应的排名和猎杀者差距
+• apex watch <玩家名> <平台> - 关注玩家，段位、分数、等级和在线状态变化时通知
+• apex unwatch <玩家名> <平台> - 取消关注
+• apex watchlist - 查看本群关注的玩家
+• apex stats - 查看插件运行统计（仅管理员）
 
 平台选项：PC, PS4, X1
 